@@ -1,337 +1,468 @@
-<<<<<<< HEAD
-from collections import Counter, defaultdict
-from typing import List, Dict, Tuple, Optional, Set
+from collections import Counter, deque
 from datetime import datetime
+import threading
+import time
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
+from sqlalchemy import func, select
 from model import (
-    WeatherData, UserInteraction,
+    db, UserInteraction,
     get_time_category, get_day_category, get_seasonal_category,
     get_weather_from_api, get_weather_based_interest,
     get_time_based_interest, get_day_based_interest, get_seasonal_interest
 )
-from math import log
-import random
-import pandas as pd
-from surprise import Dataset, Reader, SVD
-import pickle
-from sqlalchemy import func, desc
-from sqlalchemy.sql import func, desc
-from model import db, UserInteraction
 
-class CollaborativeRecommender:
-    def __init__(self):
-        self.user_interaction_matrix = None
-        self.user_similarity_matrix = None
-        self.interest_pincode_matrix = None
-        self.interest_pincode_similarity = None
-        self.interest_pincode_counts = {}
-        self.unique_interests = []
-        self.unique_pincodes = []
-        self.update_matrices()
+# Neighbours kept per interest and per pincode
+NEIGHBOURS_K = 10
+# Items scored per block when building the neighbour index, bounding its memory
+NEIGHBOUR_BLOCK_ROWS = 512
 
-    def update_matrices(self):
-        # Get all interactions
-        interactions = UserInteraction.query.all()
-        
-        if not interactions:
-            return
-            
-        # Create user-interaction matrix
-        user_interactions = {}
-        for interaction in interactions:
-            user_id = interaction.user_id
-            if user_id not in user_interactions:
-                user_interactions[user_id] = []
-            user_interactions[user_id].append({
-                'interest': interaction.interest,
-                'pincode': interaction.pincode
-            })
-            
-        # Create interest-pincode matrix
-        self.interest_pincode_counts = {}
-        for user_id, interactions in user_interactions.items():
-            for interaction in interactions:
-                key = (interaction['interest'], interaction['pincode'])
-                if key not in self.interest_pincode_counts:
-                    self.interest_pincode_counts[key] = 0
-                self.interest_pincode_counts[key] += 1
-                
-        # Convert to matrix format
-        self.unique_interests = sorted(set(k[0] for k in self.interest_pincode_counts.keys()))
-        self.unique_pincodes = sorted(set(k[1] for k in self.interest_pincode_counts.keys()))
-        
-        self.interest_pincode_matrix = np.zeros((len(self.unique_interests), len(self.unique_pincodes)))
-        for (interest, pincode), count in self.interest_pincode_counts.items():
-            i = self.unique_interests.index(interest)
-            j = self.unique_pincodes.index(pincode)
-            self.interest_pincode_matrix[i, j] = count
-            
-        # Calculate similarity matrices
-        if len(self.unique_interests) > 1 and len(self.unique_pincodes) > 1:
-            self.interest_pincode_similarity = cosine_similarity(self.interest_pincode_matrix)
-        else:
-            self.interest_pincode_similarity = np.eye(len(self.unique_interests))
+def _normalize_rows(matrix):
+    """Rows scaled to unit L2 norm (all-zero rows stay zero), kept sparse."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
 
-    def get_similar_interests(self, interest, n=3):
-        if self.interest_pincode_similarity is None or not self.interest_pincode_counts:
-            return []
-            
-        if interest not in self.unique_interests:
-            return []
-            
-        interest_idx = self.unique_interests.index(interest)
-        similarities = self.interest_pincode_similarity[interest_idx]
-        
-        # Get top N similar interests
-        similar_indices = np.argsort(similarities)[::-1][1:n+1]
-        return [self.unique_interests[i] for i in similar_indices]
+def _cosine_rows(base, increments, base_norms, items):
+    """
+    Cosine similarity of rows `items` of base + increments to every row,
+    without materializing the sum: only the requested rows and the rows with
+    increments are combined. base_norms holds the base's squared row norms.
+    """
+    norms = np.zeros(base.shape[0])
+    norms[:len(base_norms)] = base_norms
+    touched = np.unique(increments.nonzero()[0])
+    if len(touched):
+        vectors = base[touched] + increments[touched]
+        norms[touched] = np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel()
+    norms = np.sqrt(norms)
+    norms[norms == 0] = 1
+    vectors = (base[items] + increments[items]).T
+    dots = np.asarray((base @ vectors + increments @ vectors).todense()).T
+    return dots / norms[items][:, None] / norms[None, :]
 
-    def get_similar_pincodes(self, pincode, n=3):
-        if self.interest_pincode_similarity is None or not self.interest_pincode_counts:
-            return []
-            
-        if pincode not in self.unique_pincodes:
-            return []
-            
-        pincode_idx = self.unique_pincodes.index(pincode)
-        similarities = self.interest_pincode_similarity.T[pincode_idx]
-        
-        # Get top N similar pincodes
-        similar_indices = np.argsort(similarities)[::-1][1:n+1]
-        return [self.unique_pincodes[i] for i in similar_indices]
+# Rows fetched per round trip when streaming interaction counts
+STREAM_BATCH_ROWS = 10000
 
-def get_context_based_recommendation(searches, latitude, longitude):
-    """Get recommendation based on context (time, weather, etc.)"""
-    if not searches:
-        return None
-        
-    # Get current time and weather
-    current_time = datetime.now()
-    hour = current_time.hour
-    day = current_time.weekday()
-    month = current_time.month
-    
-    # Get weather data
-    weather_data = get_weather_from_api(latitude, longitude)
-    if not weather_data:
-        return None
-        
-    # Get time-based interest
-    time_interest = get_time_based_interest(hour)
-    
-    # Get day-based interest
-    day_interest = get_day_based_interest(day)
-    
-    # Get seasonal interest
-    seasonal_interest = get_seasonal_interest(month)
-    
-    # Get weather-based interest
-    weather_interest = get_weather_based_interest(weather_data.condition)
-    
-    # Combine all interests
-    all_interests = []
-    if time_interest:
-        all_interests.append(time_interest)
-    if day_interest:
-        all_interests.append(day_interest)
-    if seasonal_interest:
-        all_interests.append(seasonal_interest)
-    if weather_interest:
-        all_interests.append(weather_interest)
-        
-    # Get most common interest
-    if all_interests:
-        interest_counter = Counter(all_interests)
-        recommended_interest = interest_counter.most_common(1)[0][0]
-    else:
-        recommended_interest = searches[0]['interest']
-        
-    # Get pincode from recent searches
-    recommended_pincode = searches[0]['pincode']
-    
-    return recommended_interest, recommended_pincode
+def load_pair_counts(batch_rows=STREAM_BATCH_ROWS):
+    """
+    (interests, pincodes, counts) per distinct pair, aggregated by the
+    database and streamed batch_rows at a time through a server-side cursor.
+    Memory grows with the number of distinct pairs, not with the table.
+    Must run inside an app context.
+    """
+    interests, pincodes, counts = [], [], []
+    query = (
+        select(UserInteraction.interest, UserInteraction.pincode, func.count())
+        .group_by(UserInteraction.interest, UserInteraction.pincode)
+        .execution_options(yield_per=batch_rows)
+    )
+    for partition in db.session.execute(query).partitions():
+        for interest, pincode, count in partition:
+            interests.append(interest)
+            pincodes.append(pincode)
+            counts.append(count)
+    return interests, pincodes, counts
 
-def recommend_interest_and_pincode(searches, user_id=None, collaborative_recommender=None):
+class NeighbourIndex:
     """
-    Get recommendation using both collaborative filtering and context-based rules.
-    Returns (interest, pincode) tuple or None if no recommendation can be made.
+    The k most similar items per item, best first, as two compact (n, k)
+    arrays: neighbour ids (int32, -1 for empty slots) and cosine scores
+    (float32, -inf for empty slots).
     """
-    if not searches:
-        return None
-        
-    # Get latitude and longitude from the first search
-    first_search = searches[0]
-    latitude = first_search.get('latitude')
-    longitude = first_search.get('longitude')
-    
-    if not latitude or not longitude:
-        return None
-        
-    # Try collaborative filtering first
-    if collaborative_recommender and user_id:
-        # Get similar interests and pincodes
-        similar_interests = collaborative_recommender.get_similar_interests(first_search['interest'])
-        similar_pincodes = collaborative_recommender.get_similar_pincodes(first_search['pincode'])
-        
-        if similar_interests and similar_pincodes:
-            return similar_interests[0], similar_pincodes[0]
-    
-    # Fallback to context-based recommendation
-    return get_context_based_recommendation(searches, latitude, longitude)
 
-# Example usage
-if __name__ == "__main__":
-    # Create collaborative recommender
-    collab_recommender = CollaborativeRecommender()
-    
-    # Add some example user interactions
-    example_interactions = [
-        UserInteraction("user1", "food", "110001", datetime.now(), 1.0),
-        UserInteraction("user1", "shopping", "110001", datetime.now(), 1.0),
-        UserInteraction("user2", "food", "110002", datetime.now(), 1.0),
-        UserInteraction("user2", "entertainment", "110002", datetime.now(), 1.0),
-        UserInteraction("user3", "shopping", "110001", datetime.now(), 1.0),
-        UserInteraction("user3", "entertainment", "110001", datetime.now(), 1.0),
-    ]
-    
-    for interaction in example_interactions:
-        collab_recommender.add_interaction(interaction)
-    
-    # Example search history
-    example_searches = [
-        {'interest': 'food', 'pincode': '110001'},
-        {'interest': 'shopping', 'pincode': '110001'},
-        {'interest': 'entertainment', 'pincode': '110002'}
-    ]
-    
-    print("Testing recommendation system with both content-based and collaborative filtering...")
-    
-    # Get recommendation with collaborative filtering
-    result = recommend_interest_and_pincode(
-        example_searches,
-        user_id="user1",
-        collaborative_recommender=collab_recommender
-    )
-    
-    if result:
-        interest, pincode = result
-        print(f"\nFinal Recommendation:")
-        print(f"Recommended interest: {interest}")
-        print(f"Recommended pincode: {pincode}")
-        
-        # Show collaborative recommendations
-        print("\nCollaborative Recommendations for user1:")
-        collab_recs = collab_recommender.get_collaborative_recommendations("user1")
-        for interest, score in collab_recs:
-            print(f"{interest}: {score:.2f}")
-    else:
-        print("Not enough data to make a recommendation")
-=======
-from collections import Counter, defaultdict
-from typing import List, Dict, Tuple, Optional, Set
-from datetime import datetime
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from model import (
-    WeatherData, UserInteraction,
-    get_time_category, get_day_category, get_seasonal_category,
-    get_weather_from_api, get_weather_based_interest,
-    get_time_based_interest, get_day_based_interest, get_seasonal_interest
-)
-from math import log
-import random
-import pandas as pd
-from surprise import Dataset, Reader, SVD
-import pickle
-from sqlalchemy import func, desc
-from sqlalchemy.sql import func, desc
-from model import db, UserInteraction
+    def __init__(self, n=0, k=NEIGHBOURS_K, neighbours=None, scores=None):
+        self.k = k
+        self.neighbours = np.full((n, k), -1, dtype=np.int32) if neighbours is None else neighbours
+        self.scores = np.full((n, k), -np.inf, dtype=np.float32) if scores is None else scores
+
+    @classmethod
+    def build(cls, normalized, k=NEIGHBOURS_K, block_rows=NEIGHBOUR_BLOCK_ROWS):
+        """Index for the rows of a row-normalized sparse matrix, scored block_rows at a time."""
+        n = normalized.shape[0]
+        index = cls(n, k)
+        kept = min(k, n - 1)
+        if kept <= 0:
+            return index
+        # One side of the interest x pincode matrix is always small (interests), so dense
+        # float32 blocks stay small and the products run as plain matrix multiplies
+        other = normalized.T.astype(np.float32).toarray()
+        for start in range(0, n, block_rows):
+            stop = min(start + block_rows, n)
+            block = normalized[start:stop].astype(np.float32).toarray() @ other
+            block[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # Not your own neighbour
+            top = np.argpartition(-block, kept - 1, axis=1)[:, :kept]
+            top_scores = np.take_along_axis(block, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            index.neighbours[start:stop, :kept] = np.take_along_axis(top, order, axis=1)
+            index.scores[start:stop, :kept] = np.take_along_axis(top_scores, order, axis=1)
+        return index
+
+    def grow(self, n):
+        if n > len(self.neighbours):
+            extra = n - len(self.neighbours)
+            self.neighbours = np.vstack([self.neighbours, np.full((extra, self.k), -1, dtype=np.int32)])
+            self.scores = np.vstack([self.scores, np.full((extra, self.k), -np.inf, dtype=np.float32)])
+
+    def update(self, item, similarities):
+        """
+        Apply an item's new similarity to every other item. Its own list is
+        rebuilt, and it is inserted into or re-scored in other items' lists.
+        An item whose score drops may linger in a list until the next full build.
+        """
+        similarities = np.asarray(similarities, dtype=np.float32).copy()
+        similarities[item] = -np.inf
+        kept = min(self.k, len(similarities) - 1)
+        self.neighbours[item] = -1
+        self.scores[item] = -np.inf
+        if kept > 0:
+            top = np.argpartition(-similarities, kept - 1)[:kept]
+            top = top[np.argsort(-similarities[top])]
+            self.neighbours[item, :kept] = top
+            self.scores[item, :kept] = similarities[top]
+
+        present = self.neighbours == item
+        rows_present = present.any(axis=1)
+        self.scores[present] = similarities[np.nonzero(present)[0]]
+        candidates = ~rows_present & (similarities > self.scores.min(axis=1))
+        candidates[item] = False
+        rows = np.nonzero(candidates)[0]
+        slots = self.scores[rows].argmin(axis=1)
+        self.neighbours[rows, slots] = item
+        self.scores[rows, slots] = similarities[rows]
+
+        touched = np.nonzero(rows_present | candidates)[0]
+        order = np.argsort(-self.scores[touched], axis=1)
+        self.neighbours[touched] = np.take_along_axis(self.neighbours[touched], order, axis=1)
+        self.scores[touched] = np.take_along_axis(self.scores[touched], order, axis=1)
+
+    def lookup(self, item, n):
+        """
+        Up to n (neighbour, score) pairs with a positive score, best first. O(k).
+        An item added after the last grow() (by a concurrent add_pair) has none yet.
+        """
+        neighbours, scores = self.neighbours, self.scores
+        if item >= len(neighbours) or item >= len(scores):
+            return []
+        return [
+            (int(neighbour), float(score))
+            for neighbour, score in zip(neighbours[item, :n], scores[item, :n])
+            if neighbour >= 0 and score > 0
+        ]
 
 class CollaborativeRecommender:
-    def __init__(self):
-        self.user_interaction_matrix = None
-        self.user_similarity_matrix = None
-        self.interest_pincode_matrix = None
-        self.interest_pincode_similarity = None
-        self.interest_pincode_counts = {}
+    """
+    Interest x pincode co-occurrence counts and, derived from them, the most
+    similar interests (by the pincodes they are searched in) and the most
+    similar pincodes (by the interests searched in them).
+
+    Counts live in a sparse CSR matrix, so memory grows with the number of
+    distinct (interest, pincode) pairs seen rather than interests x pincodes.
+    Interests and pincodes map to rows and columns through dicts. Similarity
+    is kept as a top-k NeighbourIndex per side, O(items x k).
+
+    Built from every interaction once, then kept current with add_interaction:
+    a new interaction is recorded as an increment, and its interest and
+    pincode go stale. Stale items' neighbours are recomputed on the next lookup.
+
+    The built matrix is never modified, so a memory-mapped snapshot stays
+    shared between workers: increments live in a small dict of their own and
+    are added to the base counts when similarities are computed.
+    """
+
+    def __init__(self, load=True, k=NEIGHBOURS_K):
+        self.k = k
         self.unique_interests = []
         self.unique_pincodes = []
-        self.update_matrices()
+        self.interest_index = {}
+        self.pincode_index = {}
+        self.interest_pincode_matrix = sparse.csr_matrix((0, 0), dtype=np.float64)
+        self.interest_neighbours = NeighbourIndex(0, k)
+        self.pincode_neighbours = NeighbourIndex(0, k)
+        # (row, column) -> count added since the model was built or loaded
+        self._increments = {}
+        # Squared row norms of the base matrix per side, computed on first use
+        self._base_norms = None
+        # Rows/columns whose neighbours need recomputing
+        self._stale_interests = set()
+        self._stale_pincodes = set()
+        self._lock = threading.RLock()
+        if load:
+            self.update_matrices()
 
     def update_matrices(self):
-        # Get all interactions
-        interactions = UserInteraction.query.all()
-        
-        if not interactions:
+        interests, pincodes, counts = load_pair_counts()
+        if not interests:
             return
-            
-        # Create user-interaction matrix
-        user_interactions = {}
-        for interaction in interactions:
-            user_id = interaction.user_id
-            if user_id not in user_interactions:
-                user_interactions[user_id] = []
-            user_interactions[user_id].append({
-                'interest': interaction.interest,
-                'pincode': interaction.pincode
-            })
-            
-        # Create interest-pincode matrix
-        self.interest_pincode_counts = {}
-        for user_id, interactions in user_interactions.items():
-            for interaction in interactions:
-                key = (interaction['interest'], interaction['pincode'])
-                if key not in self.interest_pincode_counts:
-                    self.interest_pincode_counts[key] = 0
-                self.interest_pincode_counts[key] += 1
-                
-        # Convert to matrix format
-        self.unique_interests = sorted(set(k[0] for k in self.interest_pincode_counts.keys()))
-        self.unique_pincodes = sorted(set(k[1] for k in self.interest_pincode_counts.keys()))
-        
-        self.interest_pincode_matrix = np.zeros((len(self.unique_interests), len(self.unique_pincodes)))
-        for (interest, pincode), count in self.interest_pincode_counts.items():
-            i = self.unique_interests.index(interest)
-            j = self.unique_pincodes.index(pincode)
-            self.interest_pincode_matrix[i, j] = count
-            
-        # Calculate similarity matrices
-        if len(self.unique_interests) > 1 and len(self.unique_pincodes) > 1:
-            self.interest_pincode_similarity = cosine_similarity(self.interest_pincode_matrix)
-        else:
-            self.interest_pincode_similarity = np.eye(len(self.unique_interests))
+        self.build(interests, pincodes, counts)
+
+    def build(self, interests, pincodes, counts=None):
+        """
+        Replace the model with one built from parallel sequences of interests
+        and pincodes (and optional counts per pair; 1 each by default), in a
+        single vectorized pass. Repeated pairs are summed.
+        """
+        unique_interests, rows = np.unique(np.asarray(interests, dtype=str), return_inverse=True)
+        unique_pincodes, cols = np.unique(np.asarray(pincodes, dtype=str), return_inverse=True)
+        data = np.ones(len(rows)) if counts is None else np.asarray(counts, dtype=np.float64)
+        matrix = sparse.csr_matrix(
+            (data, (rows, cols)), shape=(len(unique_interests), len(unique_pincodes))
+        )
+        matrix.sum_duplicates()
+        self.install(
+            unique_interests.tolist(), unique_pincodes.tolist(), matrix,
+            NeighbourIndex.build(_normalize_rows(matrix), self.k),
+            NeighbourIndex.build(_normalize_rows(matrix.T.tocsr()), self.k)
+        )
+
+    def install(self, interests, pincodes, matrix, interest_neighbours, pincode_neighbours):
+        """Replace the model with already built parts (from build or a saved snapshot)."""
+        with self._lock:
+            self.unique_interests = list(interests)
+            self.unique_pincodes = list(pincodes)
+            self.interest_index = {interest: i for i, interest in enumerate(self.unique_interests)}
+            self.pincode_index = {pincode: j for j, pincode in enumerate(self.unique_pincodes)}
+            self.interest_pincode_matrix = matrix
+            self.interest_neighbours = interest_neighbours
+            self.pincode_neighbours = pincode_neighbours
+            self._increments.clear()
+            self._base_norms = None
+            self._stale_interests.clear()
+            self._stale_pincodes.clear()
+
+    def is_empty(self):
+        return self.interest_pincode_matrix.nnz == 0 and not self._increments
+
+    def add_interaction(self, interaction):
+        """Count one interaction (anything with .interest and .pincode)."""
+        self.add_pair(interaction.interest, interaction.pincode)
+
+    def add_pair(self, interest, pincode, count=1):
+        """Add `count` co-occurrences of (interest, pincode). O(1): recorded as an increment."""
+        with self._lock:
+            i = self.interest_index.get(interest)
+            if i is None:
+                i = self.interest_index[interest] = len(self.unique_interests)
+                self.unique_interests.append(interest)
+            j = self.pincode_index.get(pincode)
+            if j is None:
+                j = self.pincode_index[pincode] = len(self.unique_pincodes)
+                self.unique_pincodes.append(pincode)
+            self._increments[(i, j)] = self._increments.get((i, j), 0) + count
+            self._stale_interests.add(i)
+            self._stale_pincodes.add(j)
+
+    def _base(self):
+        """The built matrix, with empty rows and columns for items added since (its arrays are not copied)."""
+        matrix = self.interest_pincode_matrix
+        shape = (len(self.unique_interests), len(self.unique_pincodes))
+        if matrix.shape == shape:
+            return matrix
+        indptr = np.pad(matrix.indptr, (0, shape[0] - matrix.shape[0]), mode="edge")
+        return sparse.csr_matrix((matrix.data, matrix.indices, indptr), shape=shape, copy=False)
+
+    def _increment_matrix(self, shape, dtype):
+        if not self._increments:
+            return sparse.csr_matrix(shape, dtype=dtype)
+        (rows, cols), data = zip(*self._increments.keys()), list(self._increments.values())
+        return sparse.csr_matrix((np.asarray(data, dtype=dtype), (rows, cols)), shape=shape)
+
+    def counts(self):
+        """The full count matrix: base plus increments (a new matrix only when there are increments)."""
+        with self._lock:
+            base = self._base()
+            if not self._increments:
+                return base
+            return base + self._increment_matrix(base.shape, base.dtype)
+
+    def _refresh_neighbours(self):
+        """Update the neighbours of every interest and pincode touched since the last lookup."""
+        if not self._stale_interests and not self._stale_pincodes:
+            return
+        with self._lock:
+            if not self._stale_interests and not self._stale_pincodes:
+                return
+            base = self._base()
+            increments = self._increment_matrix(base.shape, base.dtype)
+            if self._base_norms is None:
+                matrix = self.interest_pincode_matrix
+                squares = matrix.multiply(matrix)
+                self._base_norms = (
+                    np.asarray(squares.sum(axis=1)).ravel(), np.asarray(squares.sum(axis=0)).ravel()
+                )
+            # The pincode side works on transposed views, so the base is never copied
+            for neighbours, base_side, increments_side, base_norms, stale in (
+                (self.interest_neighbours, base, increments, self._base_norms[0], self._stale_interests),
+                (self.pincode_neighbours, base.T, increments.T, self._base_norms[1], self._stale_pincodes)
+            ):
+                neighbours.grow(base_side.shape[0])
+                items = sorted(stale)
+                similarities = _cosine_rows(base_side, increments_side, base_norms, items)
+                for item, row in zip(items, similarities):
+                    neighbours.update(item, row)
+                stale.clear()
 
     def get_similar_interests(self, interest, n=3):
-        if self.interest_pincode_similarity is None or not self.interest_pincode_counts:
-            return []
-            
-        if interest not in self.unique_interests:
+        self._refresh_neighbours()
+        if self.is_empty() or interest not in self.interest_index:
             return []
-            
-        interest_idx = self.unique_interests.index(interest)
-        similarities = self.interest_pincode_similarity[interest_idx]
-        
-        # Get top N similar interests
-        similar_indices = np.argsort(similarities)[::-1][1:n+1]
-        return [self.unique_interests[i] for i in similar_indices]
+        neighbours = self.interest_neighbours.lookup(self.interest_index[interest], n)
+        return [self.unique_interests[i] for i, _ in neighbours]
 
     def get_similar_pincodes(self, pincode, n=3):
-        if self.interest_pincode_similarity is None or not self.interest_pincode_counts:
-            return []
-            
-        if pincode not in self.unique_pincodes:
+        self._refresh_neighbours()
+        if self.is_empty() or pincode not in self.pincode_index:
             return []
-            
-        pincode_idx = self.unique_pincodes.index(pincode)
-        similarities = self.interest_pincode_similarity.T[pincode_idx]
-        
-        # Get top N similar pincodes
-        similar_indices = np.argsort(similarities)[::-1][1:n+1]
-        return [self.unique_pincodes[i] for i in similar_indices]
+        neighbours = self.pincode_neighbours.lookup(self.pincode_index[pincode], n)
+        return [self.unique_pincodes[j] for j, _ in neighbours]
+
+# Every collaborative model refresher by name, for the admin stats endpoint
+refreshers = {}
+
+class CollaborativeRefresher:
+    """
+    Owns the live CollaborativeRecommender and replaces it in the background.
+
+    A rebuild runs on its own thread every interval_seconds, or sooner once
+    refresh_after interactions have been recorded. The new model is built off
+    to the side and swapped in with one reference assignment, so readers of
+    `current` never wait and never see a half-built model. With poll_fn,
+    models published by other processes are picked up between rebuilds.
+
+    Recorded interactions are also kept with their time, and any the new model
+    may not contain (recorded at or after its snapshot_built_at, or after the
+    build started) are replayed into it before the swap.
+    """
+
+    def __init__(self, name, build_fn, interval_seconds=900, refresh_after=5000, before_build=None,
+                 poll_fn=None, poll_seconds=60):
+        self.name = name
+        self.build_fn = build_fn
+        self.before_build = before_build
+        # poll_fn(current) returns a newer model published elsewhere (another worker), or None
+        self.poll_fn = poll_fn
+        self.poll_seconds = poll_seconds
+        self.interval = interval_seconds
+        self.refresh_after = refresh_after
+        self.current = None
+        self._lock = threading.Lock()
+        self._building = threading.Lock()
+        self._wake = threading.Event()
+        # (recorded_at, interest, pincode), oldest first, for replay into the next model
+        self._recent = deque()
+        self._build_started = None
+        self._worker = None
+        self.recorded_since_build = 0
+        self.builds = 0
+        self.failures = 0
+        self.last_build_seconds = None
+        self.last_built_at = None
+        refreshers[name] = self
+
+    def refresh(self):
+        """Build a new model and swap it in (build_fn may return `current` to keep it). Returns the model now current."""
+        with self._building:
+            if self.before_build:
+                self.before_build()
+            with self._lock:
+                self._build_started = time.time()
+            started = time.perf_counter()
+            try:
+                model = self.build_fn()
+            except Exception:
+                with self._lock:
+                    self._build_started = None
+                    self.failures += 1
+                raise
+            with self._lock:
+                build_started, self._build_started = self._build_started, None
+                if model is self.current:
+                    # Kept (e.g. the shared snapshot is still fresh): every recorded pair is already in it
+                    self.recorded_since_build = 0
+                    return model
+                # A snapshot loaded from another worker may predate this build
+                self._swap(model, getattr(model, "snapshot_built_at", None) or build_started)
+                self.builds += 1
+                self.last_build_seconds = round(time.perf_counter() - started, 2)
+            print(f"Rebuilt collaborative model ({self.name}) in {self.last_build_seconds}s")
+            return model
 
-def get_context_based_recommendation(searches, latitude, longitude):
-    """Get recommendation based on context (time, weather, etc.)"""
+    def record(self, interest, pincode):
+        """Apply one interaction to the live model and count it towards the next rebuild."""
+        with self._lock:
+            if self.current is not None:
+                self.current.add_pair(interest, pincode)
+            self._recent.append((time.time(), interest, pincode))
+            self.recorded_since_build += 1
+            due = self.refresh_after and self.recorded_since_build >= self.refresh_after
+        if due:
+            self._wake.set()
+
+    def start(self):
+        """Start the background rebuild loop (once per process)."""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f"refresh-{self.name}", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        next_build = time.monotonic() + self.interval
+        while True:
+            timeout = next_build - time.monotonic()
+            if self.poll_fn:
+                timeout = min(timeout, self.poll_seconds)
+            woken = self._wake.wait(max(timeout, 0))
+            self._wake.clear()
+            try:
+                if woken or time.monotonic() >= next_build:
+                    next_build = time.monotonic() + self.interval
+                    self.refresh()
+                else:
+                    self._poll()
+            except Exception as e:
+                print(f"Error rebuilding collaborative model ({self.name}):", str(e))
+
+    def _poll(self):
+        with self._building:
+            model = self.poll_fn(self.current)
+            if model is None:
+                return
+            with self._lock:
+                self._swap(model, getattr(model, "snapshot_built_at", None) or time.time())
+            print(f"Loaded newer collaborative model ({self.name})")
+
+    def _swap(self, model, since):
+        """Replay interactions recorded at or after `since` into model and make it current. Needs _lock."""
+        while self._recent and self._recent[0][0] < since:
+            self._recent.popleft()
+        for _, interest, pincode in self._recent:
+            model.add_pair(interest, pincode)
+        self.current = model
+        self.recorded_since_build = len(self._recent)
+        self.last_built_at = since
+
+    def stats(self):
+        with self._lock:
+            return {
+                "builds": self.builds,
+                "failures": self.failures,
+                "building": self._build_started is not None,
+                "recorded_since_build": self.recorded_since_build,
+                "last_build_seconds": self.last_build_seconds,
+                "age_seconds": round(time.time() - self.last_built_at) if self.last_built_at else None,
+                "version": getattr(self.current, "snapshot_version", None),
+                "interests": len(self.current.unique_interests) if self.current else 0,
+                "pincodes": len(self.current.unique_pincodes) if self.current else 0
+            }
+
+def refresher_stats():
+    return {name: refresher.stats() for name, refresher in refreshers.items()}
+
+def get_context_based_recommendation(searches, latitude, longitude, weather_data=None):
+    """
+    Get recommendation based on context (time, weather, etc.)
+    Weather is fetched for the location unless the caller already has it.
+    """
     if not searches:
         return None
         
@@ -342,21 +473,22 @@ def get_context_based_recommendation(searches, latitude, longitude):
     month = current_time.month
     
     # Get weather data
-    weather_data = get_weather_from_api(latitude, longitude)
+    if weather_data is None:
+        weather_data = get_weather_from_api(latitude, longitude)
     if not weather_data:
         return None
         
     # Get time-based interest
-    time_interest = get_time_based_interest(hour)
+    time_interest = get_time_based_interest(get_time_category(hour))
     
     # Get day-based interest
-    day_interest = get_day_based_interest(day)
+    day_interest = get_day_based_interest(get_day_category(day))
     
     # Get seasonal interest
-    seasonal_interest = get_seasonal_interest(month)
+    seasonal_interest = get_seasonal_interest(get_seasonal_category(month))
     
     # Get weather-based interest
-    weather_interest = get_weather_based_interest(weather_data.condition)
+    weather_interest = get_weather_based_interest(weather_data)
     
     # Combine all interests
     all_interests = []
@@ -381,10 +513,12 @@ def get_context_based_recommendation(searches, latitude, longitude):
     
     return recommended_interest, recommended_pincode
 
-def recommend_interest_and_pincode(searches, user_id=None, collaborative_recommender=None):
+def recommend_interest_and_pincode(searches, user_id=None, collaborative_recommender=None, use_context_fallback=True):
     """
     Get recommendation using both collaborative filtering and context-based rules.
     Returns (interest, pincode) tuple or None if no recommendation can be made.
+    With use_context_fallback=False only the collaborative step runs, so async
+    callers can fetch the weather themselves before the context-based fallback.
     """
     if not searches:
         return None
@@ -406,22 +540,25 @@ def recommend_interest_and_pincode(searches, user_id=None, collaborative_recomme
         if similar_interests and similar_pincodes:
             return similar_interests[0], similar_pincodes[0]
     
+    if not use_context_fallback:
+        return None
+
     # Fallback to context-based recommendation
     return get_context_based_recommendation(searches, latitude, longitude)
 
 # Example usage
 if __name__ == "__main__":
-    # Create collaborative recommender
-    collab_recommender = CollaborativeRecommender()
+    # Create an empty collaborative recommender (no database needed)
+    collab_recommender = CollaborativeRecommender(load=False)
     
     # Add some example user interactions
     example_interactions = [
-        UserInteraction("user1", "food", "110001", datetime.now(), 1.0),
-        UserInteraction("user1", "shopping", "110001", datetime.now(), 1.0),
-        UserInteraction("user2", "food", "110002", datetime.now(), 1.0),
-        UserInteraction("user2", "entertainment", "110002", datetime.now(), 1.0),
-        UserInteraction("user3", "shopping", "110001", datetime.now(), 1.0),
-        UserInteraction("user3", "entertainment", "110001", datetime.now(), 1.0),
+        UserInteraction(user_id="user1", interest="food", pincode="110001", timestamp=datetime.now()),
+        UserInteraction(user_id="user1", interest="shopping", pincode="110001", timestamp=datetime.now()),
+        UserInteraction(user_id="user2", interest="food", pincode="110002", timestamp=datetime.now()),
+        UserInteraction(user_id="user2", interest="entertainment", pincode="110002", timestamp=datetime.now()),
+        UserInteraction(user_id="user3", interest="shopping", pincode="110001", timestamp=datetime.now()),
+        UserInteraction(user_id="user3", interest="entertainment", pincode="110001", timestamp=datetime.now()),
     ]
     
     for interaction in example_interactions:
@@ -449,11 +586,8 @@ if __name__ == "__main__":
         print(f"Recommended interest: {interest}")
         print(f"Recommended pincode: {pincode}")
         
-        # Show collaborative recommendations
-        print("\nCollaborative Recommendations for user1:")
-        collab_recs = collab_recommender.get_collaborative_recommendations("user1")
-        for interest, score in collab_recs:
-            print(f"{interest}: {score:.2f}")
+        # Show collaborative neighbours
+        print("\nInterests similar to food:", collab_recommender.get_similar_interests("food"))
+        print("Pincodes similar to 110001:", collab_recommender.get_similar_pincodes("110001"))
     else:
         print("Not enough data to make a recommendation")
->>>>>>> cb83b1a40305781fd5f48ffcc08ca9c305d45b06
@@ -1,8 +1,16 @@
-from flask import render_template
+from flask import render_template, jsonify
 from . import admin_bp
 from model import db, User, UserInteraction
 from sqlalchemy import func, desc, extract
 from datetime import datetime, timedelta
+from cache import pincode_cache, search_cache, weather_cache
+from inference_batcher import batcher_stats
+from write_behind import write_behind_stats
+from People_also_search_for import refresher_stats
+from context_tables import context_tables
+from upstream import upstream_stats
+from singleflight import search_flight
+from weather_prefetch import prefetch_stats
 
 @admin_bp.route('/')
 def admin_dashboard():
@@ -125,3 +133,26 @@ def admin_dashboard():
         freq_counts=freq_counts,
         interest_datasets=interest_datasets
     )
+
+@admin_bp.route('/cache_stats')
+def cache_stats():
+    return jsonify({
+        "search": search_cache.stats(),
+        "pincode": pincode_cache.stats(),
+        "weather": weather_cache.stats(),
+        "weather_prefetch": prefetch_stats(),
+        "single_flight": search_flight.stats(),
+        "upstreams": upstream_stats()
+    })
+
+@admin_bp.route('/inference_stats')
+def inference_stats():
+    return jsonify({
+        "batchers": batcher_stats(),
+        "context_tables": context_tables.stats(),
+        "collaborative": refresher_stats()
+    })
+
+@admin_bp.route('/write_stats')
+def write_stats():
+    return jsonify(write_behind_stats())
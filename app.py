@@ -1,45 +1,74 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, make_response
-import requests
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, make_response, stream_with_context
 import os
 from dotenv import load_dotenv
-import re
 import jwt
 from datetime import datetime, timedelta
 from model import db, User, UserInteraction
-import tensorflow as tf
-import joblib
 import numpy as np
 from People_also_search_for import (
     recommend_interest_and_pincode as collab_recommender_fn,
-    CollaborativeRecommender
+    CollaborativeRecommender,
+    CollaborativeRefresher
 )
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from admin import admin_bp
+from sqlalchemy import insert
 from sqlalchemy.sql import func, desc
+from cache import search_cache
+from singleflight import search_flight
+from inference_batcher import MicroBatcher
+from write_behind import WriteBehindLog
+from nn_engine import NumpyRecommender
+from feature_vocab import FeatureSpace, FEATURES_PATH
+from context_features import time_features
+from context_tables import context_tables
+from collab_snapshot import COLLAB_SNAPSHOT_DIR, load_or_build, load_if_newer
+from weather_prefetch import WeatherPrefetcher, load_hot_cells
+import startup
+from startup import LazyComponent
+from search_pipeline import (
+    search_events, to_result_dict, to_flask_response, run_batch_search, run_bounded, BATCH_MAX_PAIRS,
+    search_cache_key, is_cacheable_search, STREAM_FORMATS, requested_stream_format,
+    split_first_error, tee_result, result_events
+)
 
-# Initialize model and encoders as None
+# Initialize model and feature lookups as None
 model = None
-user_encoder = None
-interest_encoder = None
-pincode_encoder = None
-weather_encoder = None
-lat_scaler = None
-lon_scaler = None
+features = None
+
+# Exported by `python nn_engine.py export`; when present TensorFlow is not imported
+NUMPY_MODEL_PATH = "recommender_model.npz"
+KERAS_MODEL_PATH = "recommender_model.keras"
+
+def load_recommender_model():
+    if os.path.exists(NUMPY_MODEL_PATH):
+        print("Loading NumPy recommender from", NUMPY_MODEL_PATH)
+        return NumpyRecommender.load(NUMPY_MODEL_PATH)
+    import tensorflow as tf
+    return tf.keras.models.load_model(KERAS_MODEL_PATH)
+
+ENCODER_FILES = [
+    "user_encoder.pkl",
+    "interest_encoder.pkl",
+    "pincode_encoder.pkl",
+    "weather_encoder.pkl",
+    "lat_scaler.pkl",
+    "lon_scaler.pkl"
+]
+
+def load_features():
+    # The exported JSON avoids unpickling sklearn objects
+    if os.path.exists(FEATURES_PATH):
+        return FeatureSpace.load(FEATURES_PATH)
+    return FeatureSpace.from_pickles()
 
 def load_model_and_encoders():
-    global model, user_encoder, interest_encoder, pincode_encoder, weather_encoder, lat_scaler, lon_scaler
+    global model, features
     try:
         # Check if files exist
-        required_files = [
-            "recommender_model.keras",
-            "user_encoder.pkl",
-            "interest_encoder.pkl",
-            "pincode_encoder.pkl",
-            "weather_encoder.pkl",
-            "lat_scaler.pkl",
-            "lon_scaler.pkl"
-        ]
+        model_file = NUMPY_MODEL_PATH if os.path.exists(NUMPY_MODEL_PATH) else KERAS_MODEL_PATH
+        required_files = [model_file] + ([FEATURES_PATH] if os.path.exists(FEATURES_PATH) else ENCODER_FILES)
         
         missing_files = [f for f in required_files if not os.path.exists(f)]
         if missing_files:
@@ -47,13 +76,10 @@ def load_model_and_encoders():
             return False
             
         # Load model and encoders
-        model = tf.keras.models.load_model("recommender_model.keras")
-        user_encoder = joblib.load('user_encoder.pkl')
-        interest_encoder = joblib.load('interest_encoder.pkl')
-        pincode_encoder = joblib.load('pincode_encoder.pkl')
-        weather_encoder = joblib.load('weather_encoder.pkl')
-        lat_scaler = joblib.load('lat_scaler.pkl')
-        lon_scaler = joblib.load('lon_scaler.pkl')
+        model = load_recommender_model()
+        features = load_features()
+        # Unseen users and weather are served from an OOV bucket instead of failing
+        features.set_oov_buckets(mean_rows=getattr(model, "oov_rows", False))
         
         print("Successfully loaded model and encoders")
         return True
@@ -64,8 +90,23 @@ def load_model_and_encoders():
         print("Full traceback:", traceback.format_exc())
         return False
 
-# Try to load model and encoders at startup
-model_loaded = load_model_and_encoders()
+model_loaded = False
+
+def load_nn_recommender():
+    global model_loaded
+    model_loaded = load_model_and_encoders()
+    if not model_loaded:
+        raise RuntimeError("Model and encoders not loaded")
+    return model
+
+# Concurrent contextual recommendations share one forward pass per batch
+NN_BATCH_MAX_SIZE = 64
+NN_BATCH_MAX_WAIT_MS = 5
+
+def predict_nn_batch(inputs):
+    return model.predict(inputs, batch_size=NN_BATCH_MAX_SIZE, verbose=0)
+
+nn_batcher = MicroBatcher("recommender_nn", predict_nn_batch, NN_BATCH_MAX_SIZE, NN_BATCH_MAX_WAIT_MS)
 
 load_dotenv()
 
@@ -79,16 +120,68 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 db.init_app(app)
 
-# Initialize collaborative recommender inside app context
-collab_recommender = None
+def create_schema():
+    with app.app_context():
+        db.create_all()
+    return True
+
+# The collaborative model is rebuilt in the background on a schedule or after enough new searches
+COLLAB_REFRESH_SECONDS = 15 * 60
+COLLAB_REFRESH_AFTER_INTERACTIONS = 5000
+
+def build_collab_recommender():
+    # Workers share one on-disk snapshot; only one of them scans the table per refresh
+    return load_or_build(
+        query_collab_recommender, collab_refresher.current, COLLAB_SNAPSHOT_DIR, COLLAB_REFRESH_SECONDS
+    )
+
+def query_collab_recommender():
+    with app.app_context():
+        return CollaborativeRecommender()
+
+def flush_interaction_log():
+    # Queued searches reach the table before a rebuild reads it
+    interaction_log.flush()
+
+collab_refresher = CollaborativeRefresher(
+    "collaborative", build_collab_recommender,
+    COLLAB_REFRESH_SECONDS, COLLAB_REFRESH_AFTER_INTERACTIONS, before_build=flush_interaction_log,
+    poll_fn=load_if_newer
+)
+
+def start_collab_recommender():
+    schema_component.get()
+    model = collab_refresher.refresh()
+    collab_refresher.start()
+    return model
+
+def rank_weather_cells():
+    with app.app_context():
+        return load_hot_cells()
+
+# Keeps weather for the most active areas in the cache so recommendations never wait for it
+weather_prefetcher = WeatherPrefetcher("weather", rank_weather_cells)
+
+def start_weather_prefetcher():
+    schema_component.get()
+    weather_prefetcher.start()
+    return weather_prefetcher
+
+# Loaded by the warm-up thread or on first use, depending on STARTUP_MODE
+schema_component = LazyComponent("database_schema", create_schema)
+collab_component = LazyComponent("collaborative_recommender", start_collab_recommender)
+# Optional: without model files the contextual route answers 503 but the app is usable
+nn_component = LazyComponent("recommender_nn", load_nn_recommender, required=False)
+weather_component = LazyComponent("weather_prefetcher", start_weather_prefetcher, required=False)
 
-def init_collab_recommender():
-    global collab_recommender
-    collab_recommender = CollaborativeRecommender()
+def get_collab_recommender():
+    # The refresher swaps in rebuilt models; always read the current one
+    collab_component.get()
+    return collab_refresher.current
 
-with app.app_context():
-    db.create_all()
-    init_collab_recommender()
+@app.before_request
+def ensure_schema():
+    schema_component.get()
 
 def generate_jwt(user_id, username):
     payload = {
@@ -100,7 +193,9 @@ def generate_jwt(user_id, username):
     return token
 
 def get_current_user():
-    token = request.cookies.get('jwt_token')
+    return get_user_from_token(request.cookies.get('jwt_token'))
+
+def get_user_from_token(token):
     if not token:
         return None
     try:
@@ -149,22 +244,63 @@ def signup():
             return redirect(url_for('login', signed_up='1'))
     return render_template('signup.html', message=message)
 
-API_KEY = os.environ.get("GOMAPS_API_KEY")
+def search_places_core(pincode, interest):
+    """Cached search returning the result dict, or a Flask (response, status) pair on errors."""
+    def fetch():
+        # Stale entries are refreshed off the request thread, outside any app context
+        with app.app_context():
+            return to_flask_response(search_events(pincode, interest), include_timings=app.debug)
+
+    if not pincode or not interest:
+        return fetch()
+    key = search_cache_key(pincode, interest)
+    # Concurrent misses for the same key share one upstream search
+    load = lambda: search_flight.do(f"search:flask:{key}", fetch, should_share=is_cacheable_search)
+    return search_cache.get_or_load(key, load, should_cache=is_cacheable_search)
 
-INTEREST_KEYWORDS = {
-    "education": "school OR college OR university OR coaching center",
-    "healthcare": "hospital OR clinic OR pharmacy",
-    "shopping": "mall OR market OR store",
-    "food": "restaurant OR cafe OR dhaba",
-    "travel": "monument OR tourist spot OR temple OR park",
-    "entertainment": "cinema OR amusement park OR game zone",
-    "sports": "gym OR stadium OR playground",
-    "services": "bank OR post office OR police station"
-}
+def search_places_core_raw(pincode, interest):
+    """Cached search returning the result dict; errors are {"error": ...} dicts."""
+    def fetch():
+        return to_result_dict(search_events(pincode, interest), include_timings=app.debug)
 
-def get_map_link(place_name, address):
-    query = f"{place_name}, {address}".replace(" ", "+")
-    return f"https://www.google.com/maps/search/?api=1&query={query}"
+    if not pincode or not interest:
+        return fetch()
+    key = search_cache_key(pincode, interest)
+    # Concurrent misses for the same key share one upstream search
+    load = lambda: search_flight.do(f"search:raw:{key}", fetch, should_share=is_cacheable_search)
+    return search_cache.get_or_load(key, load, should_cache=is_cacheable_search)
+
+def search_places_stream(pincode, interest, on_result=None):
+    """
+    SearchEvent stream for one search: replayed from the cache on a hit,
+    otherwise run live and cached once the stream completes. on_result is
+    called with the collected result dict.
+    """
+    key = search_cache_key(pincode, interest)
+    cached = search_cache.get(key)
+    if cached is not None:
+        if on_result:
+            on_result(cached)
+        return result_events(cached)
+
+    def finish(result):
+        if is_cacheable_search(result):
+            search_cache.set(key, result)
+        if on_result:
+            on_result(result)
+
+    return tee_result(search_events(pincode, interest), finish, include_timings=app.debug)
+
+# Ask proxies (nginx) not to buffer streamed searches
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def stream_search_response(events, stream_format, error_status=None):
+    """Streams a search as NDJSON or SSE; searches that fail up front get a JSON error."""
+    error, events = split_first_error(events)
+    if error:
+        return jsonify(error.data), error_status or error.status
+    content_type, encode = STREAM_FORMATS[stream_format]
+    return Response(stream_with_context(encode(events)), mimetype=content_type, headers=STREAM_HEADERS)
 
 @app.route('/')
 def index():
@@ -177,79 +313,72 @@ def logout():
     response.delete_cookie('jwt_token')
     return response
 
+def get_time_features(current_time):
+    """(hour, day_of_week, season) fed to the recommender, encoded as in training; context_tables precomputes the same grid"""
+    return time_features(current_time)
+
 def get_nn_recommendation(user_id, latitude, longitude, weather_condition, is_day):
-    if not model_loaded:
+    if nn_component.get() is None:
         raise ValueError("Model and encoders not properly loaded")
         
     try:
         # Get current time features
         current_time = datetime.now()
-        hour = current_time.hour
-        day_of_week = current_time.weekday()
-        month = current_time.month
-        season = (month % 12 + 3) // 3  # 1: Spring, 2: Summer, 3: Fall, 4: Winter
+        hour, day_of_week, season = get_time_features(current_time)
         
         print("Time features:", {
             "hour": hour,
             "day_of_week": day_of_week,
-            "month": month,
+            "month": current_time.month,
             "season": season
         })
         
-        # Encode inputs
-        try:
-            user_enc = user_encoder.transform([user_id])[0]
-            print("User encoded:", user_enc)
-        except Exception as e:
-            print("Error encoding user:", str(e))
-            raise ValueError(f"Invalid user_id: {user_id}")
-            
-        try:
-            weather_enc = weather_encoder.transform([weather_condition])[0]
-            print("Weather encoded:", weather_enc)
-        except Exception as e:
-            print("Error encoding weather:", str(e))
-            raise ValueError(f"Invalid weather_condition: {weather_condition}")
+        # Encode inputs; unseen users and weather map to the OOV bucket
+        user_enc = features.users.encode(user_id)
+        print("User encoded:", user_enc)
+
+        weather_enc = features.weather.encode(weather_condition)
+        print("Weather encoded:", weather_enc)
         
         # Scale coordinates
         try:
-            lat_scaled = lat_scaler.transform([[latitude]])[0][0]
-            lon_scaled = lon_scaler.transform([[longitude]])[0][0]
+            lat_scaled = features.latitude.transform(latitude)
+            lon_scaled = features.longitude.transform(longitude)
             print("Scaled coordinates:", {"lat": lat_scaled, "lon": lon_scaled})
         except Exception as e:
             print("Error scaling coordinates:", str(e))
             raise ValueError(f"Invalid coordinates: lat={latitude}, lon={longitude}")
         
-        # Prepare input arrays
-        inputs = [
-            np.array([user_enc]),
-            np.array([hour]),
-            np.array([day_of_week]),
-            np.array([season]),
-            np.array([weather_enc]),
-            np.array([is_day]),
-            np.array([lat_scaled]),
-            np.array([lon_scaled]),
-            np.array([0])  # Default last interest
-        ]
+        # One row of model inputs, in the order the model expects
+        row = (
+            user_enc,
+            hour,
+            day_of_week,
+            season,
+            weather_enc,
+            is_day,
+            lat_scaled,
+            lon_scaled,
+            0  # Default last interest
+        )
         
         print("Model inputs prepared")
         
-        # Get predictions
+        # Get predictions; the batcher runs this row with other concurrent requests
         try:
-            interest_pred, pincode_pred = model.predict(inputs)
+            interest_pred, pincode_pred = nn_batcher.predict(row)
             print("Model predictions received")
         except Exception as e:
             print("Error in model prediction:", str(e))
             raise ValueError("Failed to get model predictions")
         
         # Get most likely interest and pincode
-        interest_idx = np.argmax(interest_pred[0])
-        pincode_idx = np.argmax(pincode_pred[0])
+        interest_idx = np.argmax(interest_pred)
+        pincode_idx = np.argmax(pincode_pred)
         
         try:
-            interest = interest_encoder.inverse_transform([interest_idx])[0]
-            pincode = pincode_encoder.inverse_transform([pincode_idx])[0]
+            interest = features.interests.decode(interest_idx)
+            pincode = features.pincodes.decode(pincode_idx)
             print("Decoded predictions:", {"interest": interest, "pincode": pincode})
         except Exception as e:
             print("Error decoding predictions:", str(e))
@@ -263,6 +392,88 @@ def get_nn_recommendation(user_id, latitude, longitude, weather_condition, is_da
         print("Full traceback:", traceback.format_exc())
         raise
 
+def get_contextual_target(user, history=None):
+    """
+    Picks (pincode, interest) for the contextual recommender from the user's
+    last interaction. Returns (target, error) where error is a (payload, status)
+    pair; both are None when there is nothing to recommend. history is the
+    user's recent interactions if the caller already loaded them.
+    """
+    # Get user's last interaction for location and weather data
+    if history is None:
+        history = load_user_history(user, limit=1)
+    last_interaction = history[0] if history else None
+
+    if not last_interaction:
+        print("No interaction history found for user:", user.id)
+        return None, None
+
+    # Check if we have valid location data
+    if last_interaction.latitude is None or last_interaction.longitude is None:
+        print("Missing location data in last interaction")
+        return None, None
+
+    print("Last interaction found:", {
+        "user_id": last_interaction.user_id,
+        "latitude": last_interaction.latitude,
+        "longitude": last_interaction.longitude,
+        "weather": last_interaction.weather_condition,
+        "is_day": last_interaction.is_day
+    })
+
+    weather_condition = last_interaction.weather_condition or "clear"
+    is_day = last_interaction.is_day or True
+
+    # Precomputed top-k for this user and context; new or stale users fall through to the model
+    hour, day_of_week, season = get_time_features(datetime.now())
+    ranked = context_tables.lookup(
+        str(user.id), last_interaction.timestamp, hour, day_of_week, season, weather_condition, is_day
+    )
+    if ranked:
+        interest, pincode, score = ranked[0]
+        print("Precomputed recommendation:", {"interest": interest, "pincode": pincode, "score": score})
+        return (pincode, interest), None
+
+    # Get recommendation using neural network
+    if nn_component.get() is None:
+        return None, ({"error": "Neural network model not loaded"}, 503)
+
+    interest, pincode = get_nn_recommendation(
+        user_id=str(user.id),
+        latitude=last_interaction.latitude,
+        longitude=last_interaction.longitude,
+        weather_condition=weather_condition,
+        is_day=is_day
+    )
+    print("NN recommendation:", {"interest": interest, "pincode": pincode})
+    return (pincode, interest), None
+
+def load_user_history(user, limit=5):
+    """The user's most recent interactions, newest first."""
+    return (
+        UserInteraction.query
+        .filter_by(user_id=str(user.id))
+        .order_by(UserInteraction.timestamp.desc())
+        .limit(limit)
+        .all()
+    )
+
+def as_searches(interactions):
+    """Interactions in the search format used by the recommenders."""
+    return [
+        {
+            'interest': i.interest,
+            'pincode': i.pincode,
+            'latitude': i.latitude,
+            'longitude': i.longitude
+        }
+        for i in interactions
+    ]
+
+def load_recent_searches(user, limit=5):
+    """Returns the user's most recent interactions in the search format used by the recommenders."""
+    return as_searches(load_user_history(user, limit))
+
 @app.route('/recommend/context', methods=['POST'])
 def recommend_contextual():
     try:
@@ -273,47 +484,15 @@ def recommend_contextual():
         if not user.preferred_pincode or not user.field_of_interest:
             return jsonify({"results": []})
 
-        # Get user's last interaction for location and weather data
-        last_interaction = (
-            UserInteraction.query
-            .filter_by(user_id=str(user.id))
-            .order_by(UserInteraction.timestamp.desc())
-            .first()
-        )
-
-        if not last_interaction:
-            print("No interaction history found for user:", user.id)
-            return jsonify({"results": []})
-
-        # Check if we have valid location data
-        if last_interaction.latitude is None or last_interaction.longitude is None:
-            print("Missing location data in last interaction")
-            return jsonify({"results": []})
-
-        print("Last interaction found:", {
-            "user_id": last_interaction.user_id,
-            "latitude": last_interaction.latitude,
-            "longitude": last_interaction.longitude,
-            "weather": last_interaction.weather_condition,
-            "is_day": last_interaction.is_day
-        })
-
         try:
-            # Get recommendation using neural network
-            if model_loaded:
-                interest, pincode = get_nn_recommendation(
-                    user_id=str(user.id),
-                    latitude=last_interaction.latitude,
-                    longitude=last_interaction.longitude,
-                    weather_condition=last_interaction.weather_condition or "clear",
-                    is_day=last_interaction.is_day or True
-                )
-            else:
-                return jsonify({"error": "Neural network model not loaded"}), 503
-
-            print("NN recommendation:", {"interest": interest, "pincode": pincode})
+            target, error = get_contextual_target(user)
+            if error:
+                return jsonify(error[0]), error[1]
+            if not target:
+                return jsonify({"results": []})
 
             # Get search results
+            pincode, interest = target
             search_data = search_places_core_raw(pincode, interest)
             print("Search data:", search_data)
             
@@ -345,40 +524,12 @@ def recommend_collaborative():
         if not user.preferred_pincode or not user.field_of_interest:
             return jsonify({"results": []})
 
-        # Get user's recent interactions
-        recent_interactions = (
-            UserInteraction.query
-            .filter_by(user_id=str(user.id))
-            .order_by(UserInteraction.timestamp.desc())
-            .limit(5)
-            .all()
-        )
-
-        if not recent_interactions:
-            return jsonify({"results": []})
-
-        # Convert interactions to search format
-        searches = [
-            {
-                'interest': i.interest,
-                'pincode': i.pincode,
-                'latitude': i.latitude,
-                'longitude': i.longitude
-            }
-            for i in recent_interactions
-        ]
-
-        # Get recommendation using collaborative filtering
-        recommendation = collab_recommender_fn(
-            searches,
-            user_id=str(user.id),
-            collaborative_recommender=collab_recommender
-        )
-
-        if not recommendation:
+        # Get recommendation from the user's recent interactions using collaborative filtering
+        target, _ = get_collaborative_target(user, load_recent_searches(user))
+        if not target:
             return jsonify({"results": []})
 
-        interest, pincode = recommendation
+        pincode, interest = target
         search_data = search_places_core_raw(pincode, interest)
         
         if "error" in search_data:
@@ -405,118 +556,84 @@ def recommend_places():
     interest = user.field_of_interest
     return search_places_core(pincode, interest)
 
-def search_places_core(pincode, interest):
-    if not pincode or not interest:
-        return jsonify({"error": "PIN code and interest are required"}), 400
-
-    if not API_KEY:
-        return jsonify({"error": "GOMAPS API key is not configured"}), 500
-
+RECOMMENDATION_BLOCKS = ("preference", "context", "collaborative")
+
+def get_collaborative_target(user, searches):
+    """(pincode, interest) from the collaborative recommender, in get_contextual_target's (target, error) form."""
+    if not searches:
+        return None, None
+    recommendation = collab_recommender_fn(
+        searches,
+        user_id=str(user.id),
+        collaborative_recommender=get_collab_recommender()
+    )
+    if not recommendation:
+        return None, None
+    interest, pincode = recommendation
+    return (pincode, interest), None
+
+def recommend_all(user):
+    """
+    All three recommendation blocks for one user. Recent history is loaded
+    once, the contextual and collaborative recommenders run concurrently, and
+    the distinct (pincode, interest) targets are searched as one batch. A block
+    that fails carries its own error; the others are still returned.
+    """
+    history = load_user_history(user)
+    searches = as_searches(history)
+
+    def in_app_context(fn, *args):
+        with app.app_context():
+            return fn(*args)
+
+    outcomes = run_bounded({
+        "context": lambda: in_app_context(get_contextual_target, user, history),
+        "collaborative": lambda: in_app_context(get_collaborative_target, user, searches)
+    }, limit=2)
+    outcomes["preference"] = ((user.preferred_pincode, user.field_of_interest), None), 0, None
+
+    blocks = {}
+    targets = {}
+    for name in RECOMMENDATION_BLOCKS:
+        value, ms, exception = outcomes[name]
+        if exception is not None:
+            print(f"Error in {name} recommendation:", str(exception))
+            blocks[name] = {"error": f"Failed to generate recommendations: {str(exception)}", "results": []}
+            continue
+        target, error = value
+        if error:
+            blocks[name] = {**error[0], "results": []}
+        elif not target:
+            blocks[name] = {"results": []}
+        else:
+            targets[name] = target
+
+    # Blocks that land on the same (pincode, interest) share one search
+    pairs = list(dict.fromkeys(targets.values()))
+    results = dict(zip(pairs, search_places_batch(pairs))) if pairs else {}
+    for name, (pincode, interest) in targets.items():
+        result = results[(pincode, interest)]
+        blocks[name] = {"pincode": pincode, "interest": interest, **result}
+        blocks[name].setdefault("results", [])
+    return blocks
+
+@app.route('/recommend/all', methods=['POST'])
+def recommend_all_route():
     try:
-        # Get district/state from pincode
-        pin_url = f"https://api.postalpincode.in/pincode/{pincode}"
-        pin_response = requests.get(pin_url).json()
-        if pin_response[0]['Status'] != 'Success':
-            return jsonify({"error": "Invalid PIN code"}), 404
-
-        district = pin_response[0]['PostOffice'][0]['District']
-        state = pin_response[0]['PostOffice'][0]['State']
-
-        # Step 1: Geocode the pincode to get lat/lng
-        geocode_url = f"https://maps.gomaps.pro/maps/api/geocode/json"
-        geocode_params = {
-            'address': pincode,
-            'key': API_KEY
-        }
-        geo_resp = requests.get(geocode_url, params=geocode_params).json()
-        print("Geocode API response:", geo_resp)
+        user = get_current_user()
+        if not user:
+            return jsonify({"error": "Unauthorized"}), 401
 
-        if 'status' not in geo_resp:
-            return jsonify({"error": "Geocode API response missing 'status'. Full response: {}".format(geo_resp)}), 500
+        if not user.preferred_pincode or not user.field_of_interest:
+            return jsonify({name: {"results": []} for name in RECOMMENDATION_BLOCKS})
 
-        if geo_resp.get('status') == 'OK':
-            location = geo_resp['results'][0]['geometry']['location']
-            lat, lng = location['lat'], location['lng']
-        else:
-            return jsonify({"error": f"Failed to geocode pincode: {geo_resp.get('status')}"}), 500
-
-        # Format query based on interest
-        query_term = INTEREST_KEYWORDS.get(interest.lower(), interest)
-        search_query = f"{query_term} in {district}, {state}, India"
-
-        print("GOMAPS Query:", search_query)
-
-        # Step 2: Use lat/lng and radius in textsearch
-        search_url = f"https://maps.gomaps.pro/maps/api/place/textsearch/json"
-        params = {
-            'query': search_query,
-            'location': f"{lat},{lng}",
-            'radius': 2000,
-            'key': API_KEY,
-            'language': 'en',
-            'region': 'in'
-        }
-        
-        search_response = requests.get(search_url, params=params)
-        if not search_response.ok:
-            return jsonify({"error": "Failed to contact GOMAPS API"}), 500
-
-        search_data = search_response.json()
-        print("GOMAPS API Response:", search_data.get("status"))
-
-        if search_data.get("status") != "OK":
-            return jsonify({"error": f"GOMAPS API error: {search_data.get('status')}"}), 500
-
-        places = search_data.get("results", [])
-        if not places:
-            return jsonify({"message": "No places found for your search criteria."})
-
-        # Step 3: Filter results by pincode in address
-        filtered_places = []
-        for place in places:
-            address = place.get("formatted_address", "")
-            # Strict pincode match
-            if re.search(r'\b{}\b'.format(re.escape(str(pincode))), address):
-                filtered_places.append(place)
-
-        all_results = []
-        # Only use strictly filtered places
-        for place in filtered_places:
-            place_id = place.get("place_id")
-            name = place.get("name", "Unknown Place")
-            address = place.get("formatted_address", "No address available")
-            types = place.get("types", [])
-            place_type = ", ".join(types).replace("_", " ").title()
-
-            # Use photo_reference from textsearch result
-            photo_url = "/static/images/default_place.jpg"
-            photos = place.get("photos")
-            if photos and len(photos) > 0:
-                ref = photos[0].get("photo_reference")
-                if ref:
-                    photo_url = f"https://maps.gomaps.pro/maps/api/place/photo?maxwidth=400&photo_reference={ref}&key={API_KEY}"
-
-            # Map link
-            map_link = get_map_link(name, address)
-
-            all_results.append({
-                "name": name,
-                "address": address,
-                "place_type": place_type,
-                "photo_reference": photo_url,
-                "description": f"A {interest.lower()} place in {district}, {state}.",
-                "map_link": map_link
-            })
-
-        return {
-            "results": all_results,
-            "lat": lat,
-            "lng": lng
-        }
+        return jsonify(recommend_all(user))
 
     except Exception as e:
-        print("Exception:", e)
-        return {"error": str(e)}
+        print("Error in combined recommendation route:", str(e))
+        import traceback
+        print("Full traceback:", traceback.format_exc())
+        return jsonify({"error": "Internal server error"}), 500
 
 @app.route('/search_api', methods=['POST'])
 def search_places_api():
@@ -527,117 +644,97 @@ def search_places_api():
     if not pincode or not interest:
         return jsonify({"error": "PIN code and interest are required"}), 400
 
+    stream_format = requested_stream_format(data, request.headers.get('Accept', ''))
+    if stream_format:
+        return stream_search_response(search_places_stream(pincode, interest), stream_format)
+
     # Call the search_places_core function to get search data
     result = search_places_core_raw(pincode, interest)
     return jsonify(result)
 
-def search_places_core_raw(pincode, interest):
-    if not pincode or not interest:
-        return {"error": "PIN code and interest are required"}
-
-    if not API_KEY:
-        return {"error": "GOMAPS API key is not configured"}
-
-    try:
-        # Get district/state from pincode
-        pin_url = f"https://api.postalpincode.in/pincode/{pincode}"
-        pin_response = requests.get(pin_url).json()
-        if pin_response[0]['Status'] != 'Success':
-            return {"error": "Invalid PIN code"}
-
-        district = pin_response[0]['PostOffice'][0]['District']
-        state = pin_response[0]['PostOffice'][0]['State']
-
-        # Step 1: Geocode the pincode to get lat/lng
-        geocode_url = f"https://maps.gomaps.pro/maps/api/geocode/json"
-        geocode_params = {
-            'address': pincode,
-            'key': API_KEY
-        }
-        geo_resp = requests.get(geocode_url, params=geocode_params).json()
+def search_places_batch(pairs):
+    """Cached batch search: cache hits are served directly, misses run as one batch."""
+    results = [None] * len(pairs)
+    misses = []
+    for i, (pincode, interest) in enumerate(pairs):
+        if pincode and interest:
+            results[i] = search_cache.get(search_cache_key(pincode, interest))
+        if results[i] is None:
+            misses.append(i)
+
+    fetched = run_batch_search([pairs[i] for i in misses], include_timings=app.debug)
+    for i, result in zip(misses, fetched):
+        pincode, interest = pairs[i]
+        if is_cacheable_search(result):
+            search_cache.set(search_cache_key(pincode, interest), result)
+        results[i] = result
+    return results
+
+@app.route('/search_api/batch', methods=['POST'])
+def search_places_batch_api():
+    data = request.get_json(silent=True) or {}
+    items = data.get('pairs')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "A non-empty list of pairs is required"}), 400
+    if len(items) > BATCH_MAX_PAIRS:
+        return jsonify({"error": f"At most {BATCH_MAX_PAIRS} pairs per request"}), 400
+
+    # Each pair is {"pincode": ..., "interest": ...} or [pincode, interest]
+    pairs = []
+    for item in items:
+        if isinstance(item, dict):
+            pincode, interest = item.get('pincode'), item.get('interest')
+        elif isinstance(item, (list, tuple)) and len(item) == 2:
+            pincode, interest = item
+        else:
+            return jsonify({"error": "Each pair needs a pincode and an interest"}), 400
+        pairs.append((str(pincode).strip() if pincode else None, interest if isinstance(interest, str) else None))
 
-        if 'status' not in geo_resp:
-            return {"error": "Geocode API response missing 'status'."}
+    results = search_places_batch(pairs)
+    return jsonify({"results": [
+        {"pincode": pincode, "interest": interest, **result}
+        for (pincode, interest), result in zip(pairs, results)
+    ]})
 
-        if geo_resp.get('status') == 'OK':
-            location = geo_resp['results'][0]['geometry']['location']
-            lat, lng = location['lat'], location['lng']
-        else:
-            return {"error": f"Failed to geocode pincode: {geo_resp.get('status')}"}
-
-        # Format query based on interest
-        query_term = INTEREST_KEYWORDS.get(interest.lower(), interest)
-        search_query = f"{query_term} in {district}, {state}, India"
-
-        # Step 2: Use lat/lng and radius in textsearch
-        search_url = f"https://maps.gomaps.pro/maps/api/place/textsearch/json"
-        params = {
-            'query': search_query,
-            'location': f"{lat},{lng}",
-            'radius': 2000,
-            'key': API_KEY,
-            'language': 'en',
-            'region': 'in'
-        }
-        
-        search_response = requests.get(search_url, params=params)
-        if not search_response.ok:
-            return {"error": "Failed to contact GOMAPS API"}
-
-        search_data = search_response.json()
-
-        if search_data.get("status") != "OK":
-            return {"error": f"GOMAPS API error: {search_data.get('status')}"}
-
-        places = search_data.get("results", [])
-        if not places:
-            return {"message": "No places found for your search criteria."}
-
-        # Step 3: Filter results by pincode in address
-        filtered_places = []
-        for place in places:
-            address = place.get("formatted_address", "")
-            # Strict pincode match
-            if re.search(r'\b{}\b'.format(re.escape(str(pincode))), address):
-                filtered_places.append(place)
-
-        all_results = []
-        # Only use strictly filtered places
-        for place in filtered_places:
-            place_id = place.get("place_id")
-            name = place.get("name", "Unknown Place")
-            address = place.get("formatted_address", "No address available")
-            types = place.get("types", [])
-            place_type = ", ".join(types).replace("_", " ").title()
-
-            # Use photo_reference from textsearch result
-            photo_url = "/static/images/default_place.jpg"
-            photos = place.get("photos")
-            if photos and len(photos) > 0:
-                ref = photos[0].get("photo_reference")
-                if ref:
-                    photo_url = f"https://maps.gomaps.pro/maps/api/place/photo?maxwidth=400&photo_reference={ref}&key={API_KEY}"
-
-            # Map link
-            map_link = get_map_link(name, address)
-
-            all_results.append({
-                "name": name,
-                "address": address,
-                "place_type": place_type,
-                "photo_reference": photo_url,
-                "description": f"A {interest.lower()} place in {district}, {state}.",
-                "map_link": map_link
-            })
-
-        return {
-            "results": all_results,
-            "lat": lat,
-            "lng": lng
-        }
+def insert_interactions(rows):
+    """One multi-row INSERT per batch from the write-behind log."""
+    with app.app_context():
+        try:
+            db.session.execute(insert(UserInteraction), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+# Searches are logged from a background thread in bulk instead of one commit per request
+INTERACTION_BATCH_SIZE = 500
+INTERACTION_FLUSH_INTERVAL_MS = 1000
+INTERACTION_MAX_PENDING = 20000
+
+interaction_log = WriteBehindLog(
+    "user_interaction", insert_interactions,
+    INTERACTION_BATCH_SIZE, INTERACTION_FLUSH_INTERVAL_MS, INTERACTION_MAX_PENDING
+)
 
+def record_search_interaction(user, pincode, interest, search_data):
+    """Queue the user interaction with lat/lng and weather data for an authenticated search."""
+    try:
+        interaction_log.append({
+            "user_id": str(user.id),
+            "interest": interest,
+            "pincode": pincode,
+            "timestamp": datetime.now(),
+            "latitude": search_data.get("lat"),
+            "longitude": search_data.get("lng"),
+            "weather_condition": search_data.get("weather_condition"),
+            "is_day": search_data.get("is_day"),
+            "temperature": search_data.get("temperature")
+        })
+        # The collaborative recommender learns from the search right away, without a rebuild
+        collab_refresher.record(interest, pincode)
     except Exception as e:
-        return {"error": str(e)}
+        print("Error saving user interaction:", str(e))
+        # Continue even if saving interaction fails
 
 @app.route('/search', methods=['POST'])
 def search_places():
@@ -655,28 +752,22 @@ def search_places():
             return jsonify({"error": "PIN code and interest are required"}), 400
 
         try:
+            stream_format = requested_stream_format(data, request.headers.get('Accept', ''))
+            if stream_format:
+                # Places are sent as they pass the pincode filter; the interaction
+                # is recorded once the final lat/lng are known
+                on_result = None
+                if user:
+                    on_result = lambda result: record_search_interaction(user, pincode, interest, result)
+                events = search_places_stream(pincode, interest, on_result)
+                return stream_search_response(events, stream_format, error_status=400)
+
             # Call the search_places_core function to get search data
             search_data = search_places_core_raw(pincode, interest)
 
-            # Save user interaction with lat/lng and weather data if the user is authenticated
+            # Save user interaction if the user is authenticated
             if user:
-                try:
-                    interaction = UserInteraction(
-                        user_id=str(user.id),
-                        interest=interest,
-                        pincode=pincode,
-                        timestamp=datetime.now(),
-                        latitude=search_data.get("lat"),
-                        longitude=search_data.get("lng"),
-                        weather_condition=search_data.get("weather_condition"),
-                        is_day=search_data.get("is_day"),
-                        temperature=search_data.get("temperature")
-                    )
-                    db.session.add(interaction)
-                    db.session.commit()
-                except Exception as e:
-                    print("Error saving user interaction:", str(e))
-                    # Continue even if saving interaction fails
+                record_search_interaction(user, pincode, interest, search_data)
 
             # Return results to frontend
             if "error" in search_data:
@@ -695,6 +786,19 @@ def search_places():
         print("Full traceback:", traceback.format_exc())
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/health')
+def health():
+    # Liveness only: the process is up and serving requests
+    return jsonify({"status": "ok"})
+
+@app.route('/ready')
+def ready():
+    is_ready, status = startup.readiness()
+    payload = {"ready": is_ready, "mode": startup.STARTUP_MODE, "components": status}
+    if features is not None:
+        payload["features"] = features.stats()
+    return jsonify(payload), 200 if is_ready else 503
+
 @app.route('/me')
 def check_login():
     user = get_current_user()
@@ -703,6 +807,8 @@ def check_login():
         "username": user.username if user else None
     })
 
+startup.start()
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
@@ -0,0 +1,288 @@
+"""
+ASGI entry point. The search and recommendation routes are served natively on
+the event loop so one worker can hold many in-flight upstream searches; every
+other route is delegated to the Flask app.
+
+Run with: gunicorn asgi:application -k uvicorn.workers.UvicornWorker
+"""
+import asyncio
+import json
+from http.cookies import SimpleCookie
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+
+import app as web
+from async_search import search_places_core_async, search_places_stream_async
+from model import get_weather_from_api_async
+from People_also_search_for import (
+    recommend_interest_and_pincode as collab_recommender_fn,
+    get_context_based_recommendation
+)
+from search_pipeline import STREAM_FORMATS, close_events, requested_stream_format, split_first_error
+from upstream import async_clients
+
+flask_asgi = WsgiToAsgi(web.app)
+
+class AsyncRequest:
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.body = body
+        cookie = SimpleCookie()
+        for name, value in scope.get("headers", []):
+            if name == b"cookie":
+                cookie.load(value.decode("latin-1"))
+        self.cookies = {key: morsel.value for key, morsel in cookie.items()}
+        self.accept = ", ".join(
+            value.decode("latin-1") for name, value in scope.get("headers", []) if name == b"accept"
+        )
+
+    @property
+    def json(self):
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError:
+            return None
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+async def send_json(send, payload, status=200):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode())
+        ]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+class StreamResponse:
+    """Streamed body returned by an async route; on_complete runs after the last chunk or a disconnect."""
+
+    def __init__(self, content_type, chunks, on_complete=None):
+        self.content_type = content_type
+        self.chunks = chunks
+        self.on_complete = on_complete
+
+async def send_stream(send, response):
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", response.content_type.encode()),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no")
+        ]
+    })
+    try:
+        for chunk in response.chunks:
+            await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        # Also on client disconnect: finish the stream so its result is collected
+        close_events(response.chunks)
+        if response.on_complete:
+            await response.on_complete()
+
+async def run_sync(fn, *args):
+    """Run blocking Flask/database code in a worker thread inside an app context."""
+    def call():
+        with web.app.app_context():
+            return fn(*args)
+    return await asyncio.to_thread(call)
+
+async def get_current_user(request):
+    return await run_sync(web.get_user_from_token, request.cookies.get('jwt_token'))
+
+async def stream_search(pincode, interest, stream_format, user=None, error_status=None):
+    """Streamed search; the interaction of a signed-in user is recorded after the last record."""
+    collected = []
+    events = await search_places_stream_async(pincode, interest, web.app.debug, on_result=collected.append)
+    async def on_complete():
+        if user and collected:
+            await run_sync(web.record_search_interaction, user, pincode, interest, collected[0])
+
+    error, events = split_first_error(events)
+    if error:
+        # Failed searches are recorded too, like the non-streamed route
+        await on_complete()
+        return error.data, error_status or error.status
+
+    content_type, encode = STREAM_FORMATS[stream_format]
+    return StreamResponse(content_type, encode(events), on_complete)
+
+def search_response(search_data):
+    if "error" in search_data:
+        return {"error": search_data["error"]}, 400
+    return {"results": search_data.get("results", [])}, 200
+
+async def search_api(request):
+    data = request.json
+    if not data:
+        return {"error": "No data provided"}, 400
+    pincode = data.get('pincode')
+    interest = data.get('interest')
+
+    if not pincode or not interest:
+        return {"error": "PIN code and interest are required"}, 400
+
+    stream_format = requested_stream_format(data, request.accept)
+    if stream_format:
+        return await stream_search(pincode, interest, stream_format)
+
+    return await search_places_core_async(pincode, interest, web.app.debug), 200
+
+async def search(request):
+    user = await get_current_user(request)  # Might be None
+
+    data = request.json
+    if not data:
+        return {"error": "No data provided"}, 400
+
+    pincode = data.get('pincode')
+    interest = data.get('interest')
+
+    if not pincode or not interest:
+        return {"error": "PIN code and interest are required"}, 400
+
+    stream_format = requested_stream_format(data, request.accept)
+    if stream_format:
+        return await stream_search(pincode, interest, stream_format, user=user, error_status=400)
+
+    search_data = await search_places_core_async(pincode, interest, web.app.debug)
+    if user:
+        await run_sync(web.record_search_interaction, user, pincode, interest, search_data)
+    return search_response(search_data)
+
+async def recommend(request):
+    user = await get_current_user(request)
+    if not user:
+        return {"error": "Unauthorized"}, 401
+
+    if not user.preferred_pincode or not user.field_of_interest:
+        return {"results": []}, 200
+
+    search_data = await search_places_core_async(user.preferred_pincode, user.field_of_interest, web.app.debug)
+    if "error" in search_data:
+        return {"error": search_data["error"]}, 400
+    return search_data, 200
+
+async def recommend_contextual(request):
+    user = await get_current_user(request)
+    if not user:
+        return {"error": "Unauthorized"}, 401
+
+    if not user.preferred_pincode or not user.field_of_interest:
+        return {"results": []}, 200
+
+    try:
+        target, error = await run_sync(web.get_contextual_target, user)
+        if error:
+            return error
+        if not target:
+            return {"results": []}, 200
+
+        pincode, interest = target
+        return search_response(await search_places_core_async(pincode, interest, web.app.debug))
+    except Exception as e:
+        print("Error in recommendation process:", str(e))
+        return {"error": f"Failed to generate recommendations: {str(e)}"}, 500
+
+async def recommend_collaborative(request):
+    user = await get_current_user(request)
+    if not user:
+        return {"error": "Unauthorized"}, 401
+
+    if not user.preferred_pincode or not user.field_of_interest:
+        return {"results": []}, 200
+
+    try:
+        searches = await run_sync(web.load_recent_searches, user)
+        if not searches:
+            return {"results": []}, 200
+
+        collaborative_recommender = (
+            web.collab_refresher.current if web.collab_component.ready
+            else await run_sync(web.get_collab_recommender)
+        )
+        # Off the event loop: lookups may merge pending counts and wait for the model's lock
+        recommendation = await run_sync(
+            collab_recommender_fn, searches, str(user.id), collaborative_recommender, False
+        )
+
+        # Context-based fallback, with the weather fetched on the event loop
+        latitude = searches[0].get('latitude')
+        longitude = searches[0].get('longitude')
+        if not recommendation and latitude and longitude:
+            weather_data = await get_weather_from_api_async(latitude, longitude)
+            recommendation = get_context_based_recommendation(
+                searches, latitude, longitude, weather_data=weather_data
+            )
+
+        if not recommendation:
+            return {"results": []}, 200
+
+        interest, pincode = recommendation
+        return search_response(await search_places_core_async(pincode, interest, web.app.debug))
+    except Exception as e:
+        print("Error in collaborative recommendation:", str(e))
+        return {"error": "Failed to generate recommendations"}, 500
+
+ASYNC_ROUTES = {
+    ('POST', '/search'): search,
+    ('POST', '/search_api'): search_api,
+    ('POST', '/recommend'): recommend,
+    ('POST', '/recommend/context'): recommend_contextual,
+    ('POST', '/recommend/collaborative'): recommend_collaborative,
+}
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await run_sync(web.interaction_log.close)
+            for client in async_clients.values():
+                await client.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+
+    handler = None
+    if scope["type"] == "http":
+        handler = ASYNC_ROUTES.get((scope["method"], scope["path"].rstrip("/") or "/"))
+
+    if handler is None:
+        # Each delegated Flask request gets its own thread instead of sharing one
+        async with ThreadSensitiveContext():
+            await flask_asgi(scope, receive, send)
+        return
+
+    try:
+        if not web.schema_component.ready:
+            await run_sync(web.schema_component.get)
+        request = AsyncRequest(scope, await read_body(receive))
+        response = await handler(request)
+    except Exception as e:
+        print("Error in async route:", scope["path"], str(e))
+        import traceback
+        print("Full traceback:", traceback.format_exc())
+        response = {"error": "Internal server error"}, 500
+
+    if isinstance(response, StreamResponse):
+        await send_stream(send, response)
+    else:
+        await send_json(send, *response)
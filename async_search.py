@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+from cache import pincode_cache, search_cache
+from singleflight import search_flight
+from search_pipeline import (
+    POSTAL_API_URL, GEOCODE_API_URL, TEXTSEARCH_API_URL,
+    pincode_gazetteer, parse_postal_response, parse_geocode_response,
+    get_geocode_params, get_text_search_params, search_request_error,
+    is_resolved_geocode, as_district_state, as_geocode,
+    iter_search_events, to_result_dict, search_cache_key, is_cacheable_search,
+    SearchEvent, tee_result, result_events
+)
+from upstream import upstream_get_async
+
+# asyncio versions of the search pipeline stages in search_pipeline.py. They
+# share request building, response parsing, the result stream and the cache
+# with the threaded path.
+
+async def get_district_state_async(pincode):
+    entry = pincode_gazetteer.lookup(pincode)
+    if entry:
+        return entry.district, entry.state
+
+    async def fetch():
+        response = await upstream_get_async('postalpincode', POSTAL_API_URL.format(pincode))
+        return parse_postal_response(response.json())
+
+    cached = await pincode_cache.get_or_load_async(f"district_state:{pincode}", fetch, should_cache=bool)
+    return as_district_state(cached)
+
+async def geocode_pincode_async(pincode):
+    entry = pincode_gazetteer.lookup(pincode)
+    if entry and entry.latitude is not None:
+        return (entry.latitude, entry.longitude), 'OK'
+
+    async def fetch():
+        response = await upstream_get_async('gomaps', GEOCODE_API_URL, params=get_geocode_params(pincode))
+        return parse_geocode_response(response.json())
+
+    cached = await pincode_cache.get_or_load_async(f"geocode:{pincode}", fetch, should_cache=is_resolved_geocode)
+    return as_geocode(cached)
+
+async def text_search_places_async(interest, district_state, geocode):
+    location, _ = geocode
+    if not district_state or not location:
+        return None
+    params = get_text_search_params(interest, *district_state, *location)
+    return await upstream_get_async('gomaps', TEXTSEARCH_API_URL, params=params)
+
+async def _timed(timings, name, coro):
+    start = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+async def run_search_stages_async(pincode, interest):
+    """
+    Same stage graph as run_search_stages: district/state and geocode run
+    concurrently, the textsearch starts once both are resolved.
+    """
+    start = time.perf_counter()
+    timings = {}
+    district_state, geocode = await asyncio.gather(
+        _timed(timings, 'district_state', get_district_state_async(pincode)),
+        _timed(timings, 'geocode', geocode_pincode_async(pincode))
+    )
+    textsearch = await _timed(timings, 'textsearch', text_search_places_async(interest, district_state, geocode))
+    timings['total'] = round((time.perf_counter() - start) * 1000, 1)
+    return {'district_state': district_state, 'geocode': geocode, 'textsearch': textsearch}, timings
+
+async def search_events_async(pincode, interest):
+    """Runs one search on the event loop and returns its SearchEvent stream."""
+    error = search_request_error(pincode, interest)
+    if error:
+        return iter([error])
+
+    stage_results, timings = await run_search_stages_async(pincode, interest)
+    return iter_search_events(pincode, interest, stage_results, timings)
+
+async def fetch_places_async(pincode, interest, include_timings=False):
+    try:
+        events = await search_events_async(pincode, interest)
+    except Exception as e:
+        return {"error": str(e)}
+    return to_result_dict(events, include_timings)
+
+async def search_places_core_async(pincode, interest, include_timings=False):
+    """asyncio counterpart of search_places_core_raw, backed by the same cache."""
+    def fetch():
+        return fetch_places_async(pincode, interest, include_timings)
+
+    if not pincode or not interest:
+        return await fetch()
+    key = search_cache_key(pincode, interest)
+    # Concurrent misses for the same key share one upstream search
+    load = lambda: search_flight.do_async(f"search:raw:{key}", fetch, should_share=is_cacheable_search)
+    return await search_cache.get_or_load_async(key, load, should_cache=is_cacheable_search)
+
+async def search_places_stream_async(pincode, interest, include_timings=False, on_result=None):
+    """
+    asyncio counterpart of app.search_places_stream. The upstream stages are
+    awaited here; the returned SearchEvent iterator only filters and formats,
+    so it can be consumed while the response is being sent.
+    """
+    key = search_cache_key(pincode, interest)
+    cached = search_cache.get(key)
+    if cached is not None:
+        if on_result:
+            on_result(cached)
+        return result_events(cached)
+
+    try:
+        events = await search_events_async(pincode, interest)
+    except Exception as e:
+        print("Exception:", e)
+        events = iter([SearchEvent('error', {"error": str(e)}, 500)])
+
+    def finish(result):
+        if is_cacheable_search(result):
+            search_cache.set(key, result)
+        if on_result:
+            on_result(result)
+
+    return tee_result(events, finish, include_timings)
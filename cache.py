@@ -0,0 +1,514 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+# Every backend stores the same JSON envelope, so an entry written by one
+# worker reads back identically in every other worker and on every backend:
+#   {"v": value, "e": expires_at, "s": stale_until}   (Unix timestamps)
+
+def encode_entry(value, expires_at, stale_until):
+    return json.dumps({"v": value, "e": expires_at, "s": stale_until}, separators=(",", ":")).encode("utf-8")
+
+def decode_entry(raw):
+    """Returns (value, expires_at, stale_until)."""
+    entry = json.loads(raw)
+    return entry["v"], entry["e"], entry["s"]
+
+class CacheBackend:
+    """
+    Storage for encoded cache entries. A backend keeps bytes until their
+    `stale_until` deadline; freshness and stale-while-revalidate live in TTLCache.
+    """
+    name = "base"
+
+    def get(self, key):
+        """Return the raw entry stored under key, or None."""
+        raise NotImplementedError
+
+    def set(self, key, raw, stale_until):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self, prefix=""):
+        raise NotImplementedError
+
+    def stats(self):
+        return {"backend": self.name}
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU bounded by entry count and encoded byte size."""
+    name = "memory"
+
+    def __init__(self, max_entries=4096, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (raw, stale_until)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _remove(self, key):
+        raw, _ = self._entries.pop(key)
+        self._bytes -= len(raw)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            raw, stale_until = entry
+            if time.time() >= stale_until:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return raw
+
+    def set(self, key, raw, stale_until):
+        if len(raw) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (raw, stale_until)
+            self._bytes += len(raw)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self, prefix=""):
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.name,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "evictions": self.evictions
+            }
+
+class SQLiteBackend(CacheBackend):
+    """
+    Host-local cache shared by every worker process through one SQLite file in
+    WAL mode. Entries past their stale deadline, and the oldest writes beyond
+    max_entries, are pruned every PRUNE_EVERY_WRITES writes.
+    """
+    name = "sqlite"
+    PRUNE_EVERY_WRITES = 200
+
+    def __init__(self, path, max_entries=50000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self.evictions = 0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+            " stale_until REAL NOT NULL, written_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_written_at ON cache (written_at)")
+
+    def _conn(self):
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND stale_until > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, raw, stale_until):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (key, value, stale_until, written_at) VALUES (?, ?, ?, ?)",
+            (key, raw, stale_until, time.time())
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY_WRITES == 0:
+            self._prune()
+
+    def _prune(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE stale_until <= ?", (time.time(),))
+        deleted = conn.execute(
+            "DELETE FROM cache WHERE key IN ("
+            " SELECT key FROM cache ORDER BY written_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        self.evictions += max(deleted, 0)
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self, prefix=""):
+        self._conn().execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def stats(self):
+        (entries,) = self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()
+        return {"backend": self.name, "path": self.path, "entries": entries, "evictions": self.evictions}
+
+class RedisBackend(CacheBackend):
+    """
+    Cache on any server speaking the Redis protocol (Redis, Valkey, KeyDB or a
+    local stand-in), shared across hosts. Uses a minimal RESP client with one
+    connection per thread; the server expires entries at their stale deadline.
+    """
+    name = "redis"
+
+    def __init__(self, url="redis://localhost:6379/0", key_prefix="discover-places:", timeout=1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._local.sock = sock
+        self._local.reader = sock.makefile("rb")
+        if self.password:
+            self._send("AUTH", self.password)
+        if self.db:
+            self._send("SELECT", self.db)
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode()
+        if prefix == b"-":
+            raise RuntimeError(payload.decode())
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            return self._local.reader.read(length + 2)[:-2]
+        if prefix == b"*":
+            length = int(payload)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise RuntimeError(f"Unexpected Redis reply: {line!r}")
+
+    def _send(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._local.sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _command(self, *args):
+        # Reconnect once if a pooled connection was dropped by the server
+        for attempt in range(2):
+            try:
+                if getattr(self._local, "sock", None) is None:
+                    self._connect()
+                return self._send(*args)
+            except (OSError, ConnectionError):
+                self._close()
+                if attempt:
+                    raise
+
+    def get(self, key):
+        return self._command("GET", self.key_prefix + key)
+
+    def set(self, key, raw, stale_until):
+        ttl_ms = int((stale_until - time.time()) * 1000)
+        if ttl_ms > 0:
+            self._command("SET", self.key_prefix + key, raw, "PX", ttl_ms)
+
+    def delete(self, key):
+        self._command("DEL", self.key_prefix + key)
+
+    def clear(self, prefix=""):
+        cursor = "0"
+        while True:
+            cursor, keys = self._command("SCAN", cursor, "MATCH", self.key_prefix + prefix + "*", "COUNT", 500)
+            cursor = cursor.decode() if isinstance(cursor, bytes) else cursor
+            if keys:
+                self._command("DEL", *keys)
+            if cursor == "0":
+                return
+
+    def stats(self):
+        return {"backend": self.name, "server": f"{self.host}:{self.port}"}
+
+class TTLCache:
+    """
+    Cache with per-entry TTL over a pluggable CacheBackend. Keys are prefixed
+    with the cache's namespace so several caches can share one backend.
+
+    Expired entries are kept for a further `stale_ttl` seconds. get_or_load
+    serves such an entry immediately and refreshes it in the background, with
+    at most one refresh per key running in this process (stale-while-revalidate).
+    Values must be JSON serializable. Backend errors are counted and treated as
+    misses so an unavailable shared cache never fails a request.
+    """
+
+    def __init__(self, ttl=3600, stale_ttl=3600, backend=None, namespace="default"):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.backend = backend or MemoryBackend()
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresh_tasks = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.backend_errors = 0
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def _backend_error(self, operation, error):
+        print(f"Cache backend error on {operation}:", str(error))
+        with self._lock:
+            self.backend_errors += 1
+
+    def _lookup(self, key):
+        """Returns (value, state) where state is 'fresh', 'stale' or None."""
+        try:
+            raw = self.backend.get(self._key(key))
+            if raw is None:
+                return None, None
+            value, expires_at, stale_until = decode_entry(raw)
+        except Exception as e:
+            self._backend_error("get", e)
+            return None, None
+        now = time.time()
+        if now >= stale_until:
+            return None, None
+        return value, ('fresh' if now < expires_at else 'stale')
+
+    def get(self, key):
+        """Return a fresh cached value or None. Does not serve stale entries."""
+        value, state = self._lookup(key)
+        with self._lock:
+            if state == 'fresh':
+                self.hits += 1
+                return value
+            self.misses += 1
+            return None
+
+    def expires_in(self, key):
+        """
+        Seconds until the entry for key stops being fresh (negative while it is
+        stale), or None if there is no usable entry. Does not count as a lookup.
+        """
+        try:
+            raw = self.backend.get(self._key(key))
+            if raw is None:
+                return None
+            _, expires_at, stale_until = decode_entry(raw)
+        except Exception as e:
+            self._backend_error("get", e)
+            return None
+        now = time.time()
+        if now >= stale_until:
+            return None
+        return expires_at - now
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        stale_until = expires_at + self.stale_ttl
+        try:
+            self.backend.set(self._key(key), encode_entry(value, expires_at, stale_until), stale_until)
+        except Exception as e:
+            self._backend_error("set", e)
+
+    def delete(self, key):
+        self.backend.delete(self._key(key))
+
+    def clear(self):
+        self.backend.clear(self.namespace + ":")
+
+    def _begin_load(self, key):
+        """
+        Returns (value, state, refresh) for get_or_load. refresh is True when the
+        caller should start the single background refresh of a stale entry.
+        """
+        value, state = self._lookup(key)
+        with self._lock:
+            if state == 'fresh':
+                self.hits += 1
+                return value, state, False
+            if state == 'stale':
+                self.stale_hits += 1
+                if key in self._refreshing:
+                    return value, state, False
+                self._refreshing.add(key)
+                return value, state, True
+            self.misses += 1
+            return None, None, False
+
+    def _store(self, key, value, should_cache):
+        if should_cache is None or should_cache(value):
+            self.set(key, value)
+
+    def _finish_refresh(self, key, error=None):
+        with self._lock:
+            self._refreshing.discard(key)
+            if error is None:
+                self.refreshes += 1
+            else:
+                print("Error refreshing cache entry:", key, str(error))
+                self.refresh_errors += 1
+
+    def get_or_load(self, key, loader, should_cache=None):
+        """
+        Return the cached value for key, calling loader() on a miss.
+        Results for which should_cache(value) is False are returned but not stored.
+        """
+        value, state, refresh = self._begin_load(key)
+        if refresh:
+            threading.Thread(
+                target=self._refresh, args=(key, loader, should_cache), daemon=True
+            ).start()
+        if state:
+            return value
+
+        value = loader()
+        self._store(key, value, should_cache)
+        return value
+
+    def _refresh(self, key, loader, should_cache):
+        try:
+            self._store(key, loader(), should_cache)
+        except Exception as e:
+            self._finish_refresh(key, e)
+        else:
+            self._finish_refresh(key)
+
+    async def get_or_load_async(self, key, loader, should_cache=None):
+        """asyncio counterpart of get_or_load; loader is a coroutine function."""
+        value, state, refresh = self._begin_load(key)
+        if refresh:
+            task = asyncio.get_running_loop().create_task(self._refresh_async(key, loader, should_cache))
+            # Hold a reference so the refresh task is not garbage collected mid-flight
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+        if state:
+            return value
+
+        value = await loader()
+        self._store(key, value, should_cache)
+        return value
+
+    async def _refresh_async(self, key, loader, should_cache):
+        try:
+            self._store(key, await loader(), should_cache)
+        except Exception as e:
+            self._finish_refresh(key, e)
+        else:
+            self._finish_refresh(key)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "backend_errors": self.backend_errors
+            }
+        try:
+            stats["store"] = self.backend.stats()
+        except Exception as e:
+            stats["store"] = {"backend": self.backend.name, "error": str(e)}
+        return stats
+
+# CACHE_BACKEND selects where cached results live: "memory" (per worker),
+# "sqlite" (shared by the workers on one host) or "redis" (shared across hosts)
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+CACHE_SQLITE_PATH = os.environ.get(
+    "CACHE_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "discover-places-cache.sqlite3")
+)
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = 20000
+CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+def create_cache_backend(kind=CACHE_BACKEND):
+    if kind == "sqlite":
+        return SQLiteBackend(CACHE_SQLITE_PATH, max_entries=CACHE_MAX_ENTRIES)
+    if kind == "redis":
+        return RedisBackend(CACHE_REDIS_URL)
+    if kind != "memory":
+        print("Unknown CACHE_BACKEND, falling back to memory:", kind)
+    return MemoryBackend(max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES)
+
+cache_backend = create_cache_backend()
+
+# Final search result dicts keyed by "pincode:interest"
+SEARCH_CACHE_TTL_SECONDS = 6 * 60 * 60
+SEARCH_CACHE_STALE_SECONDS = 18 * 60 * 60
+
+# Remote district/state and geocode answers for pincodes missing from the gazetteer
+PINCODE_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Open-Meteo current conditions only change every 15 minutes
+WEATHER_CACHE_TTL_SECONDS = 15 * 60
+WEATHER_CACHE_STALE_SECONDS = 15 * 60
+
+search_cache = TTLCache(
+    ttl=SEARCH_CACHE_TTL_SECONDS,
+    stale_ttl=SEARCH_CACHE_STALE_SECONDS,
+    backend=cache_backend,
+    namespace="search"
+)
+
+pincode_cache = TTLCache(
+    ttl=PINCODE_CACHE_TTL_SECONDS,
+    stale_ttl=0,
+    backend=cache_backend,
+    namespace="pincode"
+)
+
+weather_cache = TTLCache(
+    ttl=WEATHER_CACHE_TTL_SECONDS,
+    stale_ttl=WEATHER_CACHE_STALE_SECONDS,
+    backend=cache_backend,
+    namespace="weather"
+)
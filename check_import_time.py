@@ -0,0 +1,62 @@
+"""
+Fails when importing the web app gets slow again.
+
+Imports app in a fresh interpreter with STARTUP_MODE=lazy (so nothing is
+loaded in the background) and checks that
+  - the import finishes within the budget, and
+  - none of the heavy ML libraries are imported; they belong to first use.
+
+    python check_import_time.py [budget_seconds] [module]
+"""
+import os
+import subprocess
+import sys
+import time
+
+IMPORT_BUDGET_SECONDS = 2.0
+HEAVY_MODULES = ("tensorflow", "keras", "sklearn", "pandas", "surprise", "joblib", "matplotlib")
+
+def measure_import(module):
+    env = dict(os.environ, STARTUP_MODE="lazy")
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        print(result.stdout)
+        print("\n".join(line for line in result.stderr.splitlines() if not line.startswith("import time:")))
+        raise SystemExit(f"Importing {module} failed")
+
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(cumulative)))
+    return elapsed, modules
+
+def main(budget=IMPORT_BUDGET_SECONDS, module="app"):
+    elapsed, modules = measure_import(module)
+    print(f"import {module}: {elapsed:.2f}s (budget {budget:.2f}s)")
+    print("Slowest top-level imports:")
+    top_level = [(name, us) for name, us in modules if "." not in name]
+    for name, us in sorted(top_level, key=lambda m: m[1], reverse=True)[:10]:
+        print(f"  {us / 1e6:7.3f}s  {name}")
+
+    heavy = sorted({name.split(".")[0] for name, _ in modules} & set(HEAVY_MODULES))
+    ok = True
+    if heavy:
+        print("Heavy modules imported at startup:", ", ".join(heavy))
+        ok = False
+    if elapsed > budget:
+        print("Import time over budget")
+        ok = False
+    return ok
+
+if __name__ == "__main__":
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else IMPORT_BUDGET_SECONDS
+    module = sys.argv[2] if len(sys.argv) > 2 else "app"
+    sys.exit(0 if main(budget, module) else 1)
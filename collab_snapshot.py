@@ -0,0 +1,180 @@
+"""
+On-disk snapshots of the collaborative model, shared by every worker on a host.
+
+A snapshot is a directory of .npy files (vocabularies, the CSR count matrix
+and both neighbour tables) plus meta.json, published by atomically replacing
+the CURRENT pointer like context_tables. Workers memory-map it, so the
+operating system keeps one physical copy however many workers load it, and a
+worker starting up loads it instead of scanning user_interaction.
+
+Only one worker rebuilds at a time: builders hold an flock on a lock file in
+the snapshot directory, and workers that were waiting on it load the snapshot
+the builder just published instead of building their own.
+"""
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+from scipy import sparse
+
+from People_also_search_for import CollaborativeRecommender, NeighbourIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows: every worker builds its own model
+    fcntl = None
+
+COLLAB_SNAPSHOT_DIR = os.environ.get("COLLAB_SNAPSHOT_DIR", "collab_snapshots")
+SNAPSHOT_FORMAT_VERSION = 1
+KEEP_SNAPSHOTS = 2
+
+ARRAYS = (
+    "interests", "pincodes", "data", "indices", "indptr",
+    "interest_neighbours", "interest_scores", "pincode_neighbours", "pincode_scores"
+)
+
+def save_snapshot(model, base_dir=COLLAB_SNAPSHOT_DIR, built_at=None):
+    """
+    Write the model as a new snapshot, publish it and return its version.
+    built_at is when the data was read (now by default): workers replay
+    interactions they recorded after it into the loaded model.
+    """
+    matrix = model.counts()
+    version = time.strftime("%Y%m%d-%H%M%S") + f"-{time.time_ns() % 1_000_000_000:09d}"
+    build_dir = os.path.join(base_dir, version)
+    os.makedirs(build_dir, exist_ok=True)
+    arrays = {
+        "interests": np.array(model.unique_interests, dtype=str),
+        "pincodes": np.array(model.unique_pincodes, dtype=str),
+        "data": matrix.data.astype(np.float32),
+        "indices": matrix.indices.astype(np.int32),
+        "indptr": matrix.indptr.astype(np.int64),
+        "interest_neighbours": model.interest_neighbours.neighbours,
+        "interest_scores": model.interest_neighbours.scores,
+        "pincode_neighbours": model.pincode_neighbours.neighbours,
+        "pincode_scores": model.pincode_neighbours.scores
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(build_dir, f"{name}.npy"), array)
+    built_at = built_at or time.time()
+    with open(os.path.join(build_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "version": version,
+            "built_at": built_at,
+            "shape": list(matrix.shape),
+            "k": model.k
+        }, f)
+
+    pointer = os.path.join(base_dir, "CURRENT")
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
+    prune_snapshots(base_dir, version)
+    model.snapshot_version = version
+    model.snapshot_built_at = built_at
+    return version
+
+def prune_snapshots(base_dir, current, keep=KEEP_SNAPSHOTS):
+    # Workers may still have the previous snapshot mapped, so keep a few
+    builds = sorted(name for name in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, name)))
+    for name in builds[:-keep]:
+        if name != current:
+            shutil.rmtree(os.path.join(base_dir, name), ignore_errors=True)
+
+def current_version(base_dir=COLLAB_SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(base_dir, "CURRENT"), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def read_meta(version, base_dir=COLLAB_SNAPSHOT_DIR):
+    with open(os.path.join(base_dir, version, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported collaborative snapshot format: {meta.get('format_version')}")
+    return meta
+
+def load_snapshot(version, base_dir=COLLAB_SNAPSHOT_DIR):
+    """
+    The snapshot as a CollaborativeRecommender backed by memory-mapped arrays.
+    Counts are read-only maps; neighbour tables are copy-on-write, so
+    incremental updates only copy the pages they touch.
+    """
+    meta = read_meta(version, base_dir)
+    build_dir = os.path.join(base_dir, version)
+    arrays = {}
+    for name in ARRAYS:
+        mode = "c" if name.endswith(("_neighbours", "_scores")) else "r"
+        arrays[name] = np.load(os.path.join(build_dir, f"{name}.npy"), mmap_mode=mode)
+    matrix = sparse.csr_matrix(
+        (arrays["data"], arrays["indices"], arrays["indptr"]), shape=tuple(meta["shape"]), copy=False
+    )
+    k = meta["k"]
+    model = CollaborativeRecommender(load=False, k=k)
+    model.install(
+        arrays["interests"].tolist(), arrays["pincodes"].tolist(), matrix,
+        NeighbourIndex(k=k, neighbours=arrays["interest_neighbours"], scores=arrays["interest_scores"]),
+        NeighbourIndex(k=k, neighbours=arrays["pincode_neighbours"], scores=arrays["pincode_scores"])
+    )
+    model.snapshot_version = version
+    model.snapshot_built_at = meta["built_at"]
+    return model
+
+class _BuildLock:
+    """Exclusive flock on the snapshot directory's lock file; a no-op without fcntl."""
+
+    def __init__(self, base_dir):
+        self.path = os.path.join(base_dir, ".build.lock")
+        self.handle = None
+
+    def __enter__(self):
+        if fcntl:
+            self.handle = open(self.path, "a+")
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.handle:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+
+def load_or_build(build_fn, current=None, base_dir=COLLAB_SNAPSHOT_DIR, max_age_seconds=900):
+    """
+    A model for a refresh; across workers the model is built at most once per
+    max_age_seconds. Waits for any other worker's build to finish. While the
+    published snapshot is younger than max_age_seconds it returns `current`
+    if that is the published snapshot, or loads it. Only a missing or older
+    snapshot is rebuilt with build_fn and published.
+    """
+    os.makedirs(base_dir, exist_ok=True)
+    with _BuildLock(base_dir):
+        version = current_version(base_dir)
+        if version:
+            try:
+                meta = read_meta(version, base_dir)
+                if time.time() - meta["built_at"] < max_age_seconds:
+                    if version == getattr(current, "snapshot_version", None):
+                        return current
+                    print("Loading collaborative snapshot", version)
+                    return load_snapshot(version, base_dir)
+            except (OSError, ValueError, KeyError) as e:
+                print("Error reading collaborative snapshot:", str(e))
+        started = time.time()
+        model = build_fn()
+        save_snapshot(model, base_dir, started)
+        return model
+
+def load_if_newer(current, base_dir=COLLAB_SNAPSHOT_DIR):
+    """The published snapshot if another worker has published one since `current`, else None."""
+    version = current_version(base_dir)
+    if not version or version == getattr(current, "snapshot_version", None):
+        return None
+    try:
+        return load_snapshot(version, base_dir)
+    except (OSError, ValueError, KeyError) as e:
+        print("Error loading collaborative snapshot:", str(e))
+        return None
@@ -0,0 +1,189 @@
+"""
+Context features shared by training, serving and the rule-based fallback.
+
+Every encoding is a precomputed lookup table indexed by hour, weekday, month
+or WMO weather code, so one value is a tuple index and a whole column (NumPy
+array or pandas Series) is a single fancy-indexing call. Training
+(Recommended_for_you_nn.extract_features) and serving (app, context_tables)
+both go through time_features/time_features_batch, so the model always sees
+the encoding it was trained on.
+
+The recommender's categorical weather and user inputs are encoded by
+feature_vocab; this module covers the calendar and weather-condition features.
+"""
+from datetime import datetime
+
+import numpy as np
+
+HOURS = 24
+DAYS_OF_WEEK = 7
+# Season as the recommender is trained on it: 0 winter (Dec-Feb), 1 spring, 2 summer, 3 autumn
+SEASONS = (0, 1, 2, 3)
+
+class Lookup:
+    """A code -> value table: get() for one code, take() for a column of codes."""
+
+    def __init__(self, values):
+        self.values = tuple(values)
+        self.array = np.array(self.values)
+
+    def get(self, code):
+        return self.values[code]
+
+    def take(self, codes):
+        return self.array[np.asarray(codes, dtype=np.intp)]
+
+# Index 0 is unused so months index directly
+MONTH_SEASON = Lookup([-1, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+
+TIME_CATEGORIES = ("early_morning", "breakfast", "lunch", "afternoon", "evening", "dinner", "late_night")
+HOUR_TIME_CATEGORY = Lookup(
+    TIME_CATEGORIES[code] for code in
+    [6, 6, 6, 6, 6, 0, 0, 1, 1, 1, 1, 2, 2, 2, 2, 3, 3, 4, 4, 5, 5, 5, 6, 6]
+)
+
+DAY_CATEGORIES = ("start_of_week", "mid_week", "end_of_week", "weekend")
+WEEKDAY_DAY_CATEGORY = Lookup(DAY_CATEGORIES[code] for code in [0, 1, 1, 1, 2, 3, 3])
+
+# Festive months first, then vacations, then the weather season
+MONTH_SEASONAL_CATEGORY = Lookup([
+    None, "new_year", "winter", "holi", "easter", "summer", "summer_vacation",
+    "summer_vacation", "rakhi", "autumn", "dussehra", "diwali", "christmas"
+])
+
+TIME_CATEGORY_INTERESTS = {
+    "early_morning": "fitness",
+    "breakfast": "food",
+    "lunch": "food",
+    "afternoon": "shopping",
+    "evening": "parks",
+    "dinner": "food",
+    "late_night": "entertainment"
+}
+
+DAY_CATEGORY_INTERESTS = {
+    "start_of_week": "services",
+    "mid_week": "shopping",
+    "end_of_week": "entertainment",
+    "weekend": "entertainment"
+}
+
+SEASONAL_CATEGORY_INTERESTS = {
+    # Festive seasons
+    "new_year": "entertainment",
+    "holi": "entertainment",
+    "easter": "shopping",
+    "rakhi": "shopping",
+    "dussehra": "entertainment",
+    "diwali": "shopping",
+    "christmas": "shopping",
+    # Vacations
+    "summer_vacation": "travel",
+    "winter_vacation": "travel",
+    # Weather seasons
+    "spring": "parks",
+    "summer": "water_parks",
+    "monsoon": "indoor_entertainment",
+    "autumn": "parks",
+    "winter": "indoor_entertainment"
+}
+
+WEATHER_CONDITIONS = (
+    "clear", "partly_cloudy", "cloudy", "overcast", "foggy",
+    "drizzle", "rainy", "snowy", "thunderstorm", "unknown"
+)
+UNKNOWN_WEATHER = WEATHER_CONDITIONS.index("unknown")
+CONDITION_INDEX = {condition: i for i, condition in enumerate(WEATHER_CONDITIONS)}
+
+# WMO weather codes (0-99) to conditions; codes not listed are "unknown"
+WMO_CONDITION_CODES = {
+    0: "clear", 1: "partly_cloudy", 2: "cloudy", 3: "overcast",
+    45: "foggy", 48: "foggy",
+    51: "drizzle", 53: "drizzle", 55: "drizzle",
+    61: "rainy", 63: "rainy", 65: "rainy", 80: "rainy", 81: "rainy", 82: "rainy",
+    71: "snowy", 73: "snowy", 75: "snowy", 77: "snowy", 85: "snowy", 86: "snowy",
+    95: "thunderstorm", 96: "thunderstorm", 99: "thunderstorm"
+}
+WMO_CONDITION = Lookup(WMO_CONDITION_CODES.get(code, "unknown") for code in range(100))
+
+# Interest per condition by day and by night
+WEATHER_INTERESTS = {
+    "clear": ("outdoor_activities", "entertainment"),
+    "partly_cloudy": ("outdoor_activities", "entertainment"),
+    "cloudy": ("shopping", "shopping"),
+    "overcast": ("shopping", "shopping"),
+    "foggy": ("indoor_entertainment", "indoor_entertainment"),
+    "drizzle": ("indoor_entertainment", "indoor_entertainment"),
+    "rainy": ("indoor_entertainment", "indoor_entertainment"),
+    "snowy": ("indoor_entertainment", "indoor_entertainment"),
+    "thunderstorm": ("indoor_entertainment", "indoor_entertainment"),
+    "unknown": ("general", "general")
+}
+# Rows: condition index, columns: is_day (0 night, 1 day)
+WEATHER_INTEREST_TABLE = np.array(
+    [[WEATHER_INTERESTS[condition][1], WEATHER_INTERESTS[condition][0]] for condition in WEATHER_CONDITIONS]
+)
+HOT_TEMPERATURE = 30
+COLD_TEMPERATURE = 10
+
+def time_parts_batch(timestamps):
+    """(hour, day_of_week, month) arrays for a column of naive datetimes."""
+    values = np.asarray(timestamps, dtype="datetime64[ns]")
+    days = values.astype("datetime64[D]")
+    hour = (values - days) // np.timedelta64(1, "h")
+    # 1970-01-01 was a Thursday; Monday is 0 as in datetime.weekday()
+    day_of_week = (days.astype(np.int64) + 3) % DAYS_OF_WEEK
+    month = values.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    return hour.astype(np.int64), day_of_week, month
+
+def time_features(timestamp: datetime):
+    """(hour, day_of_week, season) model inputs for one datetime."""
+    return timestamp.hour, timestamp.weekday(), MONTH_SEASON.get(timestamp.month)
+
+def time_features_batch(timestamps):
+    """(hour, day_of_week, season) model input arrays for a column of datetimes."""
+    hour, day_of_week, month = time_parts_batch(timestamps)
+    return hour, day_of_week, MONTH_SEASON.take(month)
+
+def time_category(hour: int) -> str:
+    return HOUR_TIME_CATEGORY.get(hour)
+
+def day_category(day_of_week: int) -> str:
+    return WEEKDAY_DAY_CATEGORY.get(day_of_week)
+
+def seasonal_category(month: int) -> str:
+    return MONTH_SEASONAL_CATEGORY.get(month)
+
+def time_category_batch(hours):
+    return HOUR_TIME_CATEGORY.take(hours)
+
+def day_category_batch(days_of_week):
+    return WEEKDAY_DAY_CATEGORY.take(days_of_week)
+
+def seasonal_category_batch(months):
+    return MONTH_SEASONAL_CATEGORY.take(months)
+
+def weather_condition(wmo_code: int) -> str:
+    return WMO_CONDITION.get(wmo_code) if 0 <= wmo_code < len(WMO_CONDITION.values) else "unknown"
+
+def condition_codes_batch(conditions):
+    """Indexes into WEATHER_CONDITIONS for a column of condition names; unknown names map to 'unknown'."""
+    names, inverse = np.unique(np.asarray(conditions, dtype=object).astype(str), return_inverse=True)
+    codes = np.array([CONDITION_INDEX.get(name, UNKNOWN_WEATHER) for name in names], dtype=np.intp)
+    return codes[inverse.reshape(-1)]
+
+def weather_interest(condition: str, is_day: bool, temperature: float) -> str:
+    """Likely interest for the weather; hot and cold temperatures override the condition."""
+    if temperature > HOT_TEMPERATURE:
+        return "water_parks" if is_day else "entertainment"
+    if temperature < COLD_TEMPERATURE:
+        return "indoor_entertainment"
+    return WEATHER_INTERESTS.get(condition, WEATHER_INTERESTS["unknown"])[0 if is_day else 1]
+
+def weather_interest_batch(conditions, is_day, temperature):
+    """weather_interest for whole columns."""
+    is_day = np.asarray(is_day, dtype=bool)
+    temperature = np.asarray(temperature, dtype=np.float64)
+    interest = WEATHER_INTEREST_TABLE[condition_codes_batch(conditions), is_day.astype(np.intp)]
+    interest = np.where(temperature < COLD_TEMPERATURE, "indoor_entertainment", interest)
+    return np.where(temperature > HOT_TEMPERATURE, np.where(is_day, "water_parks", "entertainment"), interest)
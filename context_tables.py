@@ -0,0 +1,291 @@
+"""
+Precomputed contextual recommendations.
+
+The contextual recommender's inputs come from small finite domains (hour,
+day of week, season, weather, is_day); only the user and their location vary,
+and /recommend/context fixes those from the user's last interaction. This job
+scores every active user over the whole context grid in large batches and
+keeps the top-k (interest, pincode, score) per cell, so serving is a lookup.
+
+Build (reads user_interaction, loads the model and encoders like the app):
+    python context_tables.py
+
+Each build is written to its own directory under CONTEXT_TABLES_DIR and then
+published by atomically replacing the CURRENT pointer, so running workers
+switch tables without ever reading a half-written one.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import func
+
+from context_features import HOURS, DAYS_OF_WEEK, SEASONS
+from model import db, UserInteraction
+
+CONTEXT_TABLES_DIR = os.environ.get("CONTEXT_TABLES_DIR", "context_tables")
+CONTEXT_TOP_K = 3
+ACTIVE_USER_DAYS = 30
+# Tables older than this are ignored and requests fall back to live inference
+MAX_TABLE_AGE_SECONDS = 36 * 60 * 60
+BUILD_BATCH_ROWS = 65536
+RELOAD_CHECK_SECONDS = 60
+KEEP_BUILDS = 2
+
+IS_DAY = (0, 1)
+
+def context_grid(n_weather):
+    """Every (hour, day_of_week, season, weather_idx, is_day) cell as five columns, in table order."""
+    grid = np.meshgrid(
+        np.arange(HOURS), np.arange(DAYS_OF_WEEK), np.array(SEASONS),
+        np.arange(n_weather), np.array(IS_DAY), indexing="ij"
+    )
+    return [axis.reshape(-1) for axis in grid]
+
+def cell_index(hour, day_of_week, season, weather_idx, is_day, n_weather):
+    """Row of a context cell in the grid produced by context_grid."""
+    cell = (hour * DAYS_OF_WEEK + day_of_week) * len(SEASONS) + SEASONS.index(season)
+    return (cell * n_weather + weather_idx) * len(IS_DAY) + int(bool(is_day))
+
+def top_k_pairs(interest_probs, pincode_probs, k):
+    """
+    Best k (interest, pincode) pairs per row, scored by the product of the two
+    heads' probabilities. The top pair is the argmax of each head, which is
+    what live inference returns. Returns (interest_idx, pincode_idx, score).
+    """
+    rows = np.arange(len(interest_probs))[:, None]
+    ki = min(k, interest_probs.shape[1])
+    kp = min(k, pincode_probs.shape[1])
+    top_interest = np.argpartition(-interest_probs, ki - 1, axis=1)[:, :ki]
+    top_pincode = np.argpartition(-pincode_probs, kp - 1, axis=1)[:, :kp]
+    joint = (interest_probs[rows, top_interest][:, :, None] * pincode_probs[rows, top_pincode][:, None, :])
+    joint = joint.reshape(len(joint), -1)
+    order = np.argsort(-joint, axis=1)[:, :min(k, ki * kp)]
+    return (
+        np.take_along_axis(top_interest, order // kp, axis=1),
+        np.take_along_axis(top_pincode, order % kp, axis=1),
+        np.take_along_axis(joint, order, axis=1)
+    )
+
+def load_active_users(days=ACTIVE_USER_DAYS):
+    """
+    (user_id, latitude, longitude, timestamp) from each recently active user's
+    latest interaction, the same row /recommend/context reads. Must run inside
+    an app context.
+    """
+    cutoff = time.time() - days * 24 * 60 * 60
+    latest = (
+        db.session.query(UserInteraction.user_id, func.max(UserInteraction.timestamp).label("timestamp"))
+        .group_by(UserInteraction.user_id)
+        .subquery()
+    )
+    rows = (
+        db.session.query(
+            UserInteraction.user_id, UserInteraction.latitude,
+            UserInteraction.longitude, UserInteraction.timestamp
+        )
+        .join(latest, (UserInteraction.user_id == latest.c.user_id) & (UserInteraction.timestamp == latest.c.timestamp))
+        .all()
+    )
+    users = {}
+    for user_id, latitude, longitude, timestamp in rows:
+        if latitude is None or longitude is None or timestamp.timestamp() < cutoff:
+            continue
+        users[user_id] = (user_id, latitude, longitude, timestamp)
+    return list(users.values())
+
+def build_context_tables(model, features, users, base_dir=CONTEXT_TABLES_DIR, k=CONTEXT_TOP_K):
+    """
+    Score `users` over the full context grid and publish a new table build.
+    features is the app's FeatureSpace. Users the model has never seen are
+    skipped; live inference serves them from the OOV bucket.
+    """
+    users = [user for user in users if user[0] in features.users]
+    if not users:
+        print("No active users known to the model; context tables not built")
+        return None
+
+    weather_vocab = features.weather.classes
+    hour, day_of_week, season, weather, is_day = context_grid(len(weather_vocab))
+    cells = len(hour)
+    k = min(k, len(features.interests) * len(features.pincodes))
+
+    user_enc = features.users.encode_batch([user[0] for user in users])
+    lat_scaled = features.latitude.transform_batch([user[1] for user in users])
+    lon_scaled = features.longitude.transform_batch([user[2] for user in users])
+
+    version = time.strftime("%Y%m%d-%H%M%S")
+    build_dir = os.path.join(base_dir, version)
+    os.makedirs(build_dir, exist_ok=True)
+    index_dtype = lambda size: np.uint16 if size <= np.iinfo(np.uint16).max else np.uint32
+    shape = (len(users), cells, k)
+    interest_table = np.lib.format.open_memmap(
+        os.path.join(build_dir, "interest.npy"), mode="w+", dtype=index_dtype(len(features.interests)), shape=shape)
+    pincode_table = np.lib.format.open_memmap(
+        os.path.join(build_dir, "pincode.npy"), mode="w+", dtype=index_dtype(len(features.pincodes)), shape=shape)
+    score_table = np.lib.format.open_memmap(
+        os.path.join(build_dir, "score.npy"), mode="w+", dtype=np.float16, shape=shape)
+
+    # Whole users per forward pass, about BUILD_BATCH_ROWS rows each
+    users_per_batch = max(1, BUILD_BATCH_ROWS // cells)
+    started = time.perf_counter()
+    for start in range(0, len(users), users_per_batch):
+        stop = min(start + users_per_batch, len(users))
+        n = stop - start
+        inputs = [
+            np.repeat(user_enc[start:stop], cells),
+            np.tile(hour, n),
+            np.tile(day_of_week, n),
+            np.tile(season, n),
+            np.tile(weather, n),
+            np.tile(is_day, n),
+            np.repeat(lat_scaled[start:stop], cells),
+            np.repeat(lon_scaled[start:stop], cells),
+            np.zeros(n * cells)  # Default last interest, as in live inference
+        ]
+        interest_probs, pincode_probs = model.predict(inputs, batch_size=BUILD_BATCH_ROWS, verbose=0)
+        interest_idx, pincode_idx, scores = top_k_pairs(np.asarray(interest_probs), np.asarray(pincode_probs), k)
+        interest_table[start:stop] = interest_idx.reshape(n, cells, k)
+        pincode_table[start:stop] = pincode_idx.reshape(n, cells, k)
+        score_table[start:stop] = scores.reshape(n, cells, k)
+    for table in (interest_table, pincode_table, score_table):
+        table.flush()
+
+    index = {
+        "version": version,
+        "built_at": time.time(),
+        "top_k": k,
+        "seasons": list(SEASONS),
+        "users": [user[0] for user in users],
+        "last_interaction": [user[3].timestamp() for user in users],
+        "weather": weather_vocab,
+        "interests": features.interests.classes,
+        "pincodes": features.pincodes.classes
+    }
+    with open(os.path.join(build_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f)
+
+    pointer = os.path.join(base_dir, "CURRENT")
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
+    prune_builds(base_dir, version)
+
+    print(f"Built context tables {version}: {len(users)} users x {cells} contexts x top-{k} "
+          f"in {time.perf_counter() - started:.1f}s")
+    return build_dir
+
+def prune_builds(base_dir, current, keep=KEEP_BUILDS):
+    # Workers may still have the previous build mapped, so keep a few
+    builds = sorted(name for name in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, name)))
+    for name in builds[:-keep]:
+        if name != current:
+            shutil.rmtree(os.path.join(base_dir, name), ignore_errors=True)
+
+class ContextTables:
+    """
+    Read side of the precomputed tables. The published build is memory-mapped
+    and the CURRENT pointer is re-checked every RELOAD_CHECK_SECONDS.
+    """
+
+    def __init__(self, base_dir=CONTEXT_TABLES_DIR):
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+        self._table = None
+        self._checked_at = None
+        self.hits = 0
+        self.misses = {}
+
+    def _load(self, version):
+        build_dir = os.path.join(self.base_dir, version)
+        with open(os.path.join(build_dir, "index.json"), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        # Tables built with another season encoding would answer for the wrong context
+        if index.get("seasons") != list(SEASONS):
+            raise ValueError(f"Context tables {version} use seasons {index.get('seasons')}, expected {list(SEASONS)}")
+        table = {
+            "index": index,
+            "user_rows": {user_id: row for row, user_id in enumerate(index["users"])},
+            "weather_idx": {weather: i for i, weather in enumerate(index["weather"])},
+        }
+        for name in ("interest", "pincode", "score"):
+            table[name] = np.load(os.path.join(build_dir, f"{name}.npy"), mmap_mode="r")
+        return table
+
+    def _current(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < RELOAD_CHECK_SECONDS:
+                return self._table
+            self._checked_at = now
+            try:
+                with open(os.path.join(self.base_dir, "CURRENT"), "r", encoding="utf-8") as f:
+                    version = f.read().strip()
+                if self._table is None or self._table["index"]["version"] != version:
+                    self._table = self._load(version)
+                    print("Loaded context tables", version)
+            except OSError:
+                pass
+            except (ValueError, KeyError) as e:
+                print("Error loading context tables:", str(e))
+            return self._table
+
+    def _miss(self, reason):
+        with self._lock:
+            self.misses[reason] = self.misses.get(reason, 0) + 1
+        return None
+
+    def lookup(self, user_id, last_interaction_time, hour, day_of_week, season, weather, is_day):
+        """
+        Top-k [(interest, pincode, score)] for a user in a context, best first.
+        Returns None when the live model should be used instead: no table,
+        table too old, user not in it, or the user has interacted since it was built.
+        """
+        table = self._current()
+        if table is None:
+            return self._miss("no_table")
+        index = table["index"]
+        if time.time() - index["built_at"] > MAX_TABLE_AGE_SECONDS:
+            return self._miss("table_stale")
+        row = table["user_rows"].get(str(user_id))
+        if row is None:
+            return self._miss("unknown_user")
+        if last_interaction_time and last_interaction_time.timestamp() > index["last_interaction"][row]:
+            return self._miss("user_stale")
+        weather_idx = table["weather_idx"].get(weather)
+        if weather_idx is None or season not in SEASONS:
+            return self._miss("unknown_context")
+
+        cell = cell_index(hour, day_of_week, season, weather_idx, is_day, len(index["weather"]))
+        with self._lock:
+            self.hits += 1
+        return [
+            (index["interests"][i], index["pincodes"][p], float(score))
+            for i, p, score in zip(table["interest"][row, cell], table["pincode"][row, cell], table["score"][row, cell])
+        ]
+
+    def stats(self):
+        table = self._table
+        with self._lock:
+            return {
+                "version": table["index"]["version"] if table else None,
+                "users": len(table["user_rows"]) if table else 0,
+                "age_seconds": round(time.time() - table["index"]["built_at"]) if table else None,
+                "hits": self.hits,
+                "misses": dict(self.misses)
+            }
+
+context_tables = ContextTables()
+
+if __name__ == "__main__":
+    import app as web
+
+    if web.nn_component.get() is None:
+        print("Model and encoders not loaded; cannot build context tables")
+        raise SystemExit(1)
+    with web.app.app_context():
+        active_users = load_active_users()
+    build_context_tables(web.model, web.features, active_users)
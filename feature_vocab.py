@@ -0,0 +1,150 @@
+"""
+Lookup tables for the recommender's categorical and scaled inputs, exported
+from the fitted sklearn LabelEncoders and MinMaxScalers.
+
+Serving encodes through dict lookups and closed-form scaling instead of
+sklearn's validated transform/inverse_transform, and unseen users or weather
+values go to a defined out-of-vocabulary bucket instead of raising.
+
+Export once from the .pkl files (written by training as well):
+    python feature_vocab.py
+"""
+import json
+import os
+
+import numpy as np
+
+FEATURES_PATH = "recommender_features.json"
+FEATURES_FORMAT_VERSION = 1
+
+class Vocabulary:
+    """Value <-> index map of one LabelEncoder. oov_index is used for unseen values when set."""
+
+    def __init__(self, classes, oov_index=None):
+        self.classes = list(classes)
+        self.index = {value: i for i, value in enumerate(self.classes)}
+        self.oov_index = oov_index
+        self.oov_hits = 0
+
+    def __len__(self):
+        return len(self.classes)
+
+    def __contains__(self, value):
+        return value in self.index
+
+    def encode(self, value):
+        i = self.index.get(value)
+        if i is not None:
+            return i
+        if self.oov_index is None:
+            raise KeyError(f"Unknown value: {value!r}")
+        self.oov_hits += 1
+        return self.oov_index
+
+    def encode_batch(self, values):
+        return np.fromiter((self.encode(value) for value in values), dtype=np.int64, count=len(values))
+
+    def decode(self, index):
+        return self.classes[index]
+
+    def decode_batch(self, indexes):
+        return [self.classes[i] for i in indexes]
+
+class MinMaxFeature:
+    """Closed form of a single-column MinMaxScaler: x * scale + offset."""
+
+    def __init__(self, scale, offset):
+        self.scale = float(scale)
+        self.offset = float(offset)
+
+    def transform(self, value):
+        return float(value) * self.scale + self.offset
+
+    def transform_batch(self, values):
+        return np.asarray(values, dtype=np.float64) * self.scale + self.offset
+
+class FeatureSpace:
+    """All encoders and scalers used by the contextual recommender."""
+
+    def __init__(self, users, interests, pincodes, weather, latitude, longitude):
+        self.users = users
+        self.interests = interests
+        self.pincodes = pincodes
+        self.weather = weather
+        self.latitude = latitude
+        self.longitude = longitude
+
+    @classmethod
+    def from_sklearn(cls, user_encoder, interest_encoder, pincode_encoder, weather_encoder, lat_scaler, lon_scaler):
+        classes = lambda encoder: np.asarray(encoder.classes_).tolist()
+        scaler = lambda s: MinMaxFeature(s.scale_[0], s.min_[0])
+        return cls(
+            Vocabulary(classes(user_encoder)),
+            Vocabulary(classes(interest_encoder)),
+            Vocabulary(classes(pincode_encoder)),
+            Vocabulary(classes(weather_encoder)),
+            scaler(lat_scaler),
+            scaler(lon_scaler)
+        )
+
+    @classmethod
+    def from_pickles(cls, directory="."):
+        """Build from the joblib files written by Recommended_for_you_nn.py."""
+        import joblib
+        load = lambda name: joblib.load(os.path.join(directory, name))
+        return cls.from_sklearn(
+            load("user_encoder.pkl"), load("interest_encoder.pkl"), load("pincode_encoder.pkl"),
+            load("weather_encoder.pkl"), load("lat_scaler.pkl"), load("lon_scaler.pkl")
+        )
+
+    @classmethod
+    def load(cls, path=FEATURES_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format_version") != FEATURES_FORMAT_VERSION:
+            raise ValueError(f"Unsupported features format: {data.get('format_version')}")
+        return cls(
+            Vocabulary(data["users"]),
+            Vocabulary(data["interests"]),
+            Vocabulary(data["pincodes"]),
+            Vocabulary(data["weather"]),
+            MinMaxFeature(*data["latitude"]),
+            MinMaxFeature(*data["longitude"])
+        )
+
+    def save(self, path=FEATURES_PATH):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "format_version": FEATURES_FORMAT_VERSION,
+                "users": self.users.classes,
+                "interests": self.interests.classes,
+                "pincodes": self.pincodes.classes,
+                "weather": self.weather.classes,
+                "latitude": [self.latitude.scale, self.latitude.offset],
+                "longitude": [self.longitude.scale, self.longitude.offset]
+            }, f)
+        print("Saved recommender features to", path)
+
+    def set_oov_buckets(self, mean_rows, default_weather="clear"):
+        """
+        Choose where unseen users and weather values go. With mean_rows (the
+        NumPy engine's extra mean-embedding row per table) they get that row;
+        otherwise users fall back to index 0 and weather to default_weather.
+        """
+        if mean_rows:
+            self.users.oov_index = len(self.users)
+            self.weather.oov_index = len(self.weather)
+        else:
+            self.users.oov_index = 0
+            self.weather.oov_index = self.weather.index.get(default_weather, 0)
+
+    def stats(self):
+        return {
+            "users": len(self.users),
+            "weather": len(self.weather),
+            "user_oov_hits": self.users.oov_hits,
+            "weather_oov_hits": self.weather.oov_hits
+        }
+
+if __name__ == "__main__":
+    FeatureSpace.from_pickles().save(FEATURES_PATH)
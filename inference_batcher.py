@@ -0,0 +1,125 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# Every batcher by name, for the admin stats endpoint
+batchers = {}
+
+class MicroBatcher:
+    """
+    Collects concurrent single-row inference requests into batches.
+
+    Callers submit one row (a tuple with one value per model input). A worker
+    thread takes the first waiting row, keeps collecting until it has
+    max_batch_size rows or max_wait_ms has passed, stacks the rows into one
+    array per input and runs a single predict_fn call. Row i of each output
+    array is handed back to the i-th caller.
+    """
+
+    def __init__(self, name, predict_fn, max_batch_size=64, max_wait_ms=5):
+        self.name = name
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self.batches = 0
+        self.rows = 0
+        self.errors = 0
+        self.max_queue_depth = 0
+        self.histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self.total_wait_ms = 0.0
+        self.total_predict_ms = 0.0
+        batchers[name] = self
+
+    def _ensure_worker(self):
+        # Started on first use so forked web workers each get their own thread
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f"batcher-{self.name}", daemon=True)
+                self._worker.start()
+
+    def submit(self, row):
+        """Queue one row and return a Future for its tuple of outputs."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((row, future, time.perf_counter()))
+        depth = self._queue.qsize()
+        with self._lock:
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+        return future
+
+    def predict(self, row, timeout=None):
+        """Blocking single-row predict through the batch queue."""
+        return self.submit(row).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            rows = [row for row, _, _ in batch]
+            try:
+                inputs = [np.array(column) for column in zip(*rows)]
+                outputs = self.predict_fn(inputs)
+            except Exception as e:
+                print(f"Error in batched inference ({self.name}):", str(e))
+                with self._lock:
+                    self.errors += 1
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            for i, (_, future, _) in enumerate(batch):
+                future.set_result(tuple(output[i] for output in outputs))
+            self._record(batch, started, finished)
+
+    def _record(self, batch, started, finished):
+        with self._lock:
+            self.batches += 1
+            self.rows += len(batch)
+            self.total_predict_ms += (finished - started) * 1000
+            self.total_wait_ms += sum((started - queued) * 1000 for _, _, queued in batch)
+            for bucket in BATCH_SIZE_BUCKETS:
+                if len(batch) <= bucket:
+                    self.histogram[bucket] += 1
+                    break
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "batches": self.batches,
+                "rows": self.rows,
+                "errors": self.errors,
+                "mean_batch_size": round(self.rows / self.batches, 2) if self.batches else 0,
+                "mean_queue_wait_ms": round(self.total_wait_ms / self.rows, 2) if self.rows else 0,
+                "mean_predict_ms": round(self.total_predict_ms / self.batches, 2) if self.batches else 0,
+                "batch_size_histogram": {f"<={bucket}": count for bucket, count in self.histogram.items()},
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000
+            }
+
+def batcher_stats():
+    return {name: batcher.stats() for name, batcher in batchers.items()}
@@ -0,0 +1,201 @@
+"""
+NumPy serving engine for the recommender built by create_model in
+Recommended_for_you_nn.py, so web workers do not need TensorFlow.
+
+Export the trained Keras model once (needs TensorFlow):
+    python nn_engine.py export recommender_model.keras recommender_model.npz
+Check the export against Keras on random inputs:
+    python nn_engine.py verify recommender_model.keras recommender_model.npz
+"""
+import sys
+
+import numpy as np
+
+NPZ_FORMAT_VERSION = 1
+
+# Width of each block of the first Dense layer's input, in concatenation order
+EMBEDDING_INPUTS = ("user_id", "weather", "last_interest")
+SCALAR_INPUTS = ("hour", "day_of_week", "season", "is_day", "latitude", "longitude")
+# Order of model.predict inputs
+MODEL_INPUTS = (
+    "user_id", "hour", "day_of_week", "season", "weather",
+    "is_day", "latitude", "longitude", "last_interest"
+)
+
+def fold_weights(raw):
+    """
+    Turn the trained layer weights into the arrays the engine serves from.
+
+    raw holds: the three embedding tables, dense1/dense2 (shared base), the
+    BatchNormalization parameters and the two heads (*_hidden, *_output).
+
+    - Each embedding table is multiplied by its slice of dense1's kernel, so
+      the first layer becomes three row lookups plus a 6-wide matmul.
+    - BatchNormalization comes after dense1's ReLU, so it cannot go into dense1.
+      At inference it is a per-channel affine map (h * scale + shift), which
+      folds exactly into dense2: kernel rows scaled by `scale`, bias += shift @ kernel.
+      Dropout is the identity at inference.
+    """
+    kernel1, bias1 = raw["dense1"]
+    offset = 0
+    folded = {}
+    for name in EMBEDDING_INPUTS:
+        table = raw["embedding_" + name]
+        width = table.shape[1]
+        folded["proj_" + name] = table @ kernel1[offset:offset + width]
+        offset += width
+    folded["scalar_kernel"] = kernel1[offset:]
+    folded["bias1"] = bias1
+
+    gamma, beta, mean, variance, epsilon = raw["batch_norm"]
+    scale = gamma / np.sqrt(variance + epsilon)
+    shift = beta - mean * scale
+    kernel2, bias2 = raw["dense2"]
+    folded["kernel2"] = kernel2 * scale[:, None]
+    folded["bias2"] = bias2 + shift @ kernel2
+
+    for head in ("interest", "pincode"):
+        folded[head + "_hidden_kernel"], folded[head + "_hidden_bias"] = raw[head + "_hidden"]
+        folded[head + "_output_kernel"], folded[head + "_output_bias"] = raw[head + "_output"]
+
+    folded = {name: np.asarray(array, dtype=np.float32) for name, array in folded.items()}
+    folded["format_version"] = np.array(NPZ_FORMAT_VERSION)
+    return folded
+
+def _source_layer(layer):
+    """The layer feeding `layer` (single-input layers only)."""
+    history = layer.input._keras_history
+    return history[0]
+
+def extract_keras_weights(model):
+    """Collect the raw weights fold_weights expects by walking the Keras graph back from the heads."""
+    raw = {}
+    for layer in model.layers:
+        if type(layer).__name__ == "Embedding":
+            raw["embedding_" + _source_layer(layer).name] = layer.get_weights()[0]
+
+    dense2 = None
+    for head in ("interest", "pincode"):
+        output = model.get_layer(head + "_output")
+        hidden = _source_layer(output)
+        raw[head + "_output"] = output.get_weights()
+        raw[head + "_hidden"] = hidden.get_weights()
+        dense2 = _source_layer(hidden)
+    raw["dense2"] = dense2.get_weights()
+
+    layer = _source_layer(dense2)
+    while type(layer).__name__ == "Dropout":
+        layer = _source_layer(layer)
+    if type(layer).__name__ != "BatchNormalization":
+        raise ValueError(f"Expected BatchNormalization before the shared Dense(32), found {layer.name}")
+    gamma, beta, mean, variance = layer.get_weights()
+    raw["batch_norm"] = (gamma, beta, mean, variance, layer.epsilon)
+    raw["dense1"] = _source_layer(layer).get_weights()
+    return raw
+
+def export_model(model, out_path="recommender_model.npz"):
+    np.savez_compressed(out_path, **fold_weights(extract_keras_weights(model)))
+    print("Exported NumPy recommender weights to", out_path)
+
+def export_keras_file(model_path="recommender_model.keras", out_path="recommender_model.npz"):
+    import tensorflow as tf
+    export_model(tf.keras.models.load_model(model_path), out_path)
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+def _softmax(x):
+    x = x - x.max(axis=1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=1, keepdims=True)
+    return x
+
+class NumpyRecommender:
+    """
+    Drop-in replacement for the Keras model's predict: takes the same nine
+    input arrays and returns [interest_probabilities, pincode_probabilities].
+
+    Each embedding table gets one extra row, the mean of the trained rows, at
+    index vocab_sizes[name]. Feature vocabularies send unseen users and
+    weather values there (see FeatureSpace.set_oov_buckets).
+    """
+    oov_rows = True
+
+    def __init__(self, weights):
+        if int(weights["format_version"]) != NPZ_FORMAT_VERSION:
+            raise ValueError(f"Unsupported recommender npz format: {int(weights['format_version'])}")
+        self.weights = {name: weights[name] for name in weights if name != "format_version"}
+        self.vocab_sizes = {}
+        for name in EMBEDDING_INPUTS:
+            table = self.weights["proj_" + name]
+            self.vocab_sizes[name] = len(table)
+            self.weights["proj_" + name] = np.vstack([table, table.mean(axis=0, keepdims=True)])
+
+    @classmethod
+    def load(cls, path="recommender_model.npz"):
+        with np.load(path) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def predict(self, inputs, batch_size=None, verbose=0):
+        """batch_size and verbose are accepted for compatibility with Keras and ignored."""
+        w = self.weights
+        columns = dict(zip(MODEL_INPUTS, (np.asarray(x).reshape(-1) for x in inputs)))
+
+        scalars = np.stack([columns[name].astype(np.float32) for name in SCALAR_INPUTS], axis=1)
+        h = scalars @ w["scalar_kernel"]
+        h += w["bias1"]
+        for name in EMBEDDING_INPUTS:
+            # Keras embeddings truncate float indices the same way
+            h += w["proj_" + name][columns[name].astype(np.int64)]
+        h = _relu(h)
+
+        shared = _relu(h @ w["kernel2"] + w["bias2"])
+
+        outputs = []
+        for head in ("interest", "pincode"):
+            hidden = _relu(shared @ w[head + "_hidden_kernel"] + w[head + "_hidden_bias"])
+            outputs.append(_softmax(hidden @ w[head + "_output_kernel"] + w[head + "_output_bias"]))
+        return outputs
+
+def random_inputs(engine, n, seed=0):
+    """Valid random model inputs for comparing the engine with Keras."""
+    rng = np.random.default_rng(seed)
+    sizes = engine.vocab_sizes
+    return [
+        rng.integers(0, sizes["user_id"], n),
+        rng.integers(0, 24, n),
+        rng.integers(0, 7, n),
+        rng.integers(0, 4, n),
+        rng.integers(0, sizes["weather"], n),
+        rng.integers(0, 2, n),
+        rng.random(n),
+        rng.random(n),
+        rng.integers(0, sizes["last_interest"], n),
+    ]
+
+def verify_export(model_path="recommender_model.keras", npz_path="recommender_model.npz", n=512, atol=1e-5):
+    import tensorflow as tf
+    model = tf.keras.models.load_model(model_path)
+    engine = NumpyRecommender.load(npz_path)
+    inputs = random_inputs(engine, n)
+    ok = True
+    for rows in (1, n):
+        batch = [x[:rows] for x in inputs]
+        expected = model.predict(batch, verbose=0)
+        actual = engine.predict(batch)
+        for name, e, a in zip(("interest", "pincode"), expected, actual):
+            diff = float(np.abs(e - a).max())
+            print(f"{name} head, {rows} row(s): max abs diff {diff:.2e}")
+            ok = ok and diff <= atol
+    print("Export matches Keras" if ok else "Export does NOT match Keras")
+    return ok
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("export", "verify"):
+        print("Usage: python nn_engine.py export|verify [model.keras] [model.npz]")
+        sys.exit(1)
+    paths = sys.argv[2:4]
+    if sys.argv[1] == "export":
+        export_keras_file(*paths)
+    else:
+        sys.exit(0 if verify_export(*paths) else 1)
@@ -0,0 +1,216 @@
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+GAZETTEER_PATH = "pincode_gazetteer.bin"
+
+# File layout (little endian):
+#   magic (8 bytes) | header length (uint32) | JSON header, padded to 8 bytes
+#   slots     int32[SLOT_COUNT]   row index per pincode, -1 when unknown
+#   latitude  float32[count]      NaN when the directory has no coordinates
+#   longitude float32[count]
+#   district  uint16[count]       index into header["districts"]
+#   state     uint8[count]        index into header["states"]
+MAGIC = b"PINGAZ01"
+MIN_PINCODE = 100000
+SLOT_COUNT = 900000
+
+# Column names used by the different India Post directory exports
+COLUMN_ALIASES = {
+    "pincode": ("pincode", "pin code", "pin"),
+    "district": ("district", "districtname", "district name"),
+    "state": ("statename", "state", "state name"),
+    "latitude": ("latitude", "lat"),
+    "longitude": ("longitude", "long", "lng", "lon"),
+}
+
+@dataclass
+class PincodeEntry:
+    district: str
+    state: str
+    latitude: Optional[float]
+    longitude: Optional[float]
+
+def _pincode_slot(pincode) -> int:
+    try:
+        value = int(str(pincode).strip())
+    except (TypeError, ValueError):
+        return -1
+    slot = value - MIN_PINCODE
+    return slot if 0 <= slot < SLOT_COUNT else -1
+
+def _align(offset: int, size: int) -> int:
+    return (offset + size - 1) // size * size
+
+class PincodeGazetteer:
+    """
+    Read-only pincode -> (district, state, centroid) table backed by a
+    memory-mapped file. Lookups index straight into a slot array, so they are
+    O(1) and only touch the pages they need.
+    """
+
+    def __init__(self, path: str = GAZETTEER_PATH):
+        self.path = path
+        self.count = 0
+        self._districts = []
+        self._states = []
+        self._slots = None
+        self._mmap = None
+        self.loaded = self._load()
+
+    def _load(self) -> bool:
+        if not os.path.exists(self.path):
+            print("Pincode gazetteer not found, using remote lookups:", self.path)
+            return False
+        try:
+            with open(self.path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            buf = self._mmap
+            if buf[:len(MAGIC)] != MAGIC:
+                raise ValueError("bad magic")
+            (header_len,) = struct.unpack_from("<I", buf, len(MAGIC))
+            header_start = len(MAGIC) + 4
+            header = json.loads(bytes(buf[header_start:header_start + header_len]).decode("utf-8"))
+            offset = _align(header_start + header_len, 8)
+
+            count = header["count"]
+            self._slots = np.frombuffer(buf, dtype="<i4", count=SLOT_COUNT, offset=offset)
+            offset += SLOT_COUNT * 4
+            self._lat = np.frombuffer(buf, dtype="<f4", count=count, offset=offset)
+            offset += count * 4
+            self._lng = np.frombuffer(buf, dtype="<f4", count=count, offset=offset)
+            offset += count * 4
+            self._district_idx = np.frombuffer(buf, dtype="<u2", count=count, offset=offset)
+            offset += count * 2
+            self._state_idx = np.frombuffer(buf, dtype="u1", count=count, offset=offset)
+
+            self._districts = header["districts"]
+            self._states = header["states"]
+            self.count = count
+            print(f"Loaded pincode gazetteer with {count} pincodes")
+            return True
+        except Exception as e:
+            print("Error loading pincode gazetteer:", str(e))
+            self._slots = None
+            return False
+
+    def __len__(self):
+        return self.count
+
+    def lookup(self, pincode) -> Optional[PincodeEntry]:
+        """Return the entry for a pincode, or None if it is not in the gazetteer."""
+        if self._slots is None:
+            return None
+        slot = _pincode_slot(pincode)
+        if slot < 0:
+            return None
+        row = int(self._slots[slot])
+        if row < 0:
+            return None
+        lat = round(float(self._lat[row]), 6)
+        lng = round(float(self._lng[row]), 6)
+        has_coords = not (np.isnan(lat) or np.isnan(lng))
+        return PincodeEntry(
+            district=self._districts[self._district_idx[row]],
+            state=self._states[self._state_idx[row]],
+            latitude=lat if has_coords else None,
+            longitude=lng if has_coords else None
+        )
+
+def _resolve_columns(fieldnames):
+    normalized = {name.strip().lower(): name for name in fieldnames if name}
+    columns = {}
+    for key, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in normalized:
+                columns[key] = normalized[alias]
+                break
+    missing = [k for k in ("pincode", "district", "state") if k not in columns]
+    if missing:
+        raise ValueError(f"CSV is missing required columns: {missing}")
+    return columns
+
+def _parse_coord(value) -> Optional[float]:
+    try:
+        coord = float(value)
+    except (TypeError, ValueError):
+        return None
+    return coord if coord != 0.0 else None
+
+def build_gazetteer(csv_path: str, out_path: str = GAZETTEER_PATH) -> int:
+    """
+    Build the binary gazetteer from an India Post pincode directory CSV.
+    A pincode spans several post offices; the first row supplies the district
+    and state and the centroid is the mean of all rows with coordinates.
+    Returns the number of pincodes written.
+    """
+    entries: Dict[int, dict] = {}
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        columns = _resolve_columns(reader.fieldnames or [])
+        for row in reader:
+            slot = _pincode_slot(row[columns["pincode"]])
+            if slot < 0:
+                continue
+            entry = entries.setdefault(slot, {
+                "district": row[columns["district"]].strip().title(),
+                "state": row[columns["state"]].strip().title(),
+                "lat_sum": 0.0,
+                "lng_sum": 0.0,
+                "points": 0
+            })
+            lat = _parse_coord(row.get(columns.get("latitude")))
+            lng = _parse_coord(row.get(columns.get("longitude")))
+            if lat is not None and lng is not None:
+                entry["lat_sum"] += lat
+                entry["lng_sum"] += lng
+                entry["points"] += 1
+
+    districts = sorted(set(e["district"] for e in entries.values()))
+    states = sorted(set(e["state"] for e in entries.values()))
+    if len(districts) > np.iinfo(np.uint16).max or len(states) > np.iinfo(np.uint8).max:
+        raise ValueError("Too many districts or states for the gazetteer format")
+    district_index = {d: i for i, d in enumerate(districts)}
+    state_index = {s: i for i, s in enumerate(states)}
+
+    count = len(entries)
+    slots = np.full(SLOT_COUNT, -1, dtype="<i4")
+    lat = np.full(count, np.nan, dtype="<f4")
+    lng = np.full(count, np.nan, dtype="<f4")
+    district_idx = np.zeros(count, dtype="<u2")
+    state_idx = np.zeros(count, dtype="u1")
+    for row, slot in enumerate(sorted(entries)):
+        entry = entries[slot]
+        slots[slot] = row
+        if entry["points"]:
+            lat[row] = entry["lat_sum"] / entry["points"]
+            lng[row] = entry["lng_sum"] / entry["points"]
+        district_idx[row] = district_index[entry["district"]]
+        state_idx[row] = state_index[entry["state"]]
+
+    header = json.dumps({"count": count, "districts": districts, "states": states}).encode("utf-8")
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(b"\0" * (_align(f.tell(), 8) - f.tell()))
+        for array in (slots, lat, lng, district_idx, state_idx):
+            f.write(array.tobytes())
+    os.replace(tmp_path, out_path)
+    return count
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python pincode_gazetteer.py <pincode_directory.csv> [output.bin]")
+        sys.exit(1)
+    output = sys.argv[2] if len(sys.argv) > 2 else GAZETTEER_PATH
+    written = build_gazetteer(sys.argv[1], output)
+    print(f"Wrote {written} pincodes to {output}")
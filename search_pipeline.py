@@ -0,0 +1,583 @@
+import json
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from dotenv import load_dotenv
+from flask import jsonify
+
+from cache import pincode_cache
+from pincode_gazetteer import PincodeGazetteer
+from upstream import upstream_get
+
+load_dotenv()
+
+API_KEY = os.environ.get("GOMAPS_API_KEY")
+
+INTEREST_KEYWORDS = {
+    "education": "school OR college OR university OR coaching center",
+    "healthcare": "hospital OR clinic OR pharmacy",
+    "shopping": "mall OR market OR store",
+    "food": "restaurant OR cafe OR dhaba",
+    "travel": "monument OR tourist spot OR temple OR park",
+    "entertainment": "cinema OR amusement park OR game zone",
+    "sports": "gym OR stadium OR playground",
+    "services": "bank OR post office OR police station"
+}
+
+POSTAL_API_URL = "https://api.postalpincode.in/pincode/{}"
+GEOCODE_API_URL = "https://maps.gomaps.pro/maps/api/geocode/json"
+TEXTSEARCH_API_URL = "https://maps.gomaps.pro/maps/api/place/textsearch/json"
+PHOTO_API_URL = "https://maps.gomaps.pro/maps/api/place/photo?maxwidth=400&photo_reference={}&key={}"
+DEFAULT_PHOTO_URL = "/static/images/default_place.jpg"
+
+# Upstream stages are I/O bound, so the pool is sized for concurrent requests
+SEARCH_WORKERS = 32
+
+# Batch searches: pairs accepted per request, and upstream calls one batch may
+# have in flight so a single batch cannot take over the shared pool
+BATCH_MAX_PAIRS = 50
+BATCH_CONCURRENCY = 8
+
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search-stage")
+
+pincode_gazetteer = PincodeGazetteer()
+
+# --- Stage graph runner ---
+
+def _timed(fn, kwargs):
+    start = time.perf_counter()
+    result = fn(**kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+def run_stages(stages, executor=search_executor):
+    """
+    Run a small dependency graph of pipeline stages.
+
+    `stages` maps a stage name to (fn, deps). A stage is submitted to the
+    executor as soon as every stage in deps has finished, and fn is called with
+    those results as keyword arguments, so independent stages run concurrently.
+
+    Returns (results, timings) where timings holds each stage's run time in
+    milliseconds plus the wall-clock total. The first stage error is re-raised.
+    """
+    start = time.perf_counter()
+    results = {}
+    timings = {}
+    running = {}
+    waiting = dict(stages)
+
+    def submit_ready():
+        for name, (fn, deps) in list(waiting.items()):
+            if all(dep in results for dep in deps):
+                del waiting[name]
+                kwargs = {dep: results[dep] for dep in deps}
+                running[executor.submit(_timed, fn, kwargs)] = name
+
+    submit_ready()
+    while running:
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = running.pop(future)
+            try:
+                results[name], timings[name] = future.result()
+            except Exception:
+                for other in running:
+                    other.cancel()
+                raise
+        submit_ready()
+
+    if waiting:
+        raise ValueError(f"Unresolvable stage dependencies: {sorted(waiting)}")
+
+    timings = {name: round(ms, 1) for name, ms in timings.items()}
+    timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+    return results, timings
+
+def run_bounded(calls, limit, executor=search_executor):
+    """
+    Run independent calls {key: fn} with at most `limit` in flight.
+
+    Calls are submitted from the caller's thread as earlier ones finish, never
+    from inside a pool task, so the shared pool cannot deadlock on tasks
+    waiting for each other. Returns {key: (result, ms, error)}.
+    """
+    outcomes = {}
+    pending = deque(calls.items())
+    running = {}
+    while pending or running:
+        while pending and len(running) < limit:
+            key, fn = pending.popleft()
+            running[executor.submit(_timed, fn, {})] = key
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            key = running.pop(future)
+            try:
+                result, ms = future.result()
+                outcomes[key] = (result, round(ms, 1), None)
+            except Exception as e:
+                outcomes[key] = (None, None, e)
+    return outcomes
+
+# --- Upstream requests and parsing, shared by the threaded and asyncio paths ---
+
+def parse_postal_response(pin_response):
+    if pin_response[0]['Status'] != 'Success':
+        return None
+    post_office = pin_response[0]['PostOffice'][0]
+    return post_office['District'], post_office['State']
+
+def parse_geocode_response(geo_resp):
+    if 'status' not in geo_resp:
+        print("Geocode API response missing 'status':", geo_resp)
+        return None, None
+
+    if geo_resp['status'] != 'OK':
+        return None, geo_resp['status']
+
+    location = geo_resp['results'][0]['geometry']['location']
+    return (location['lat'], location['lng']), 'OK'
+
+def get_geocode_params(pincode):
+    return {
+        'address': pincode,
+        'key': API_KEY
+    }
+
+def get_text_search_params(interest, district, state, lat, lng):
+    # Format query based on interest
+    query_term = INTEREST_KEYWORDS.get(interest.lower(), interest)
+    search_query = f"{query_term} in {district}, {state}, India"
+
+    # Use lat/lng and radius in textsearch
+    return {
+        'query': search_query,
+        'location': f"{lat},{lng}",
+        'radius': 2000,
+        'key': API_KEY,
+        'language': 'en',
+        'region': 'in'
+    }
+
+# Remote lookups are cached as JSON, so tuples come back as lists
+
+def is_resolved_geocode(geocode):
+    return geocode[1] == 'OK'
+
+def as_district_state(cached):
+    return tuple(cached) if cached else None
+
+def as_geocode(cached):
+    location, status = cached
+    return (tuple(location) if location else None), status
+
+def get_district_state(pincode):
+    """
+    Returns (district, state) for a pincode, or None if the pincode is invalid.
+    Uses the local gazetteer and falls back to api.postalpincode.in.
+    """
+    entry = pincode_gazetteer.lookup(pincode)
+    if entry:
+        return entry.district, entry.state
+
+    def fetch():
+        pin_response = upstream_get('postalpincode', POSTAL_API_URL.format(pincode)).json()
+        return parse_postal_response(pin_response)
+
+    return as_district_state(pincode_cache.get_or_load(f"district_state:{pincode}", fetch, should_cache=bool))
+
+def geocode_pincode(pincode):
+    """
+    Returns ((lat, lng), status) for a pincode. Uses the gazetteer centroid when
+    available and falls back to the GoMaps geocode API. The location is None
+    when the status is not 'OK'; the status is None if the API omitted it.
+    """
+    entry = pincode_gazetteer.lookup(pincode)
+    if entry and entry.latitude is not None:
+        return (entry.latitude, entry.longitude), 'OK'
+
+    def fetch():
+        geo_resp = upstream_get('gomaps', GEOCODE_API_URL, params=get_geocode_params(pincode)).json()
+        return parse_geocode_response(geo_resp)
+
+    return as_geocode(pincode_cache.get_or_load(f"geocode:{pincode}", fetch, should_cache=is_resolved_geocode))
+
+def text_search_places(interest, district_state, geocode):
+    """
+    Runs the GoMaps textsearch for an interest around a resolved pincode and
+    returns the response. Returns None without calling the API when the
+    pincode could not be resolved.
+    """
+    location, _ = geocode
+    if not district_state or not location:
+        return None
+    params = get_text_search_params(interest, *district_state, *location)
+    return upstream_get('gomaps', TEXTSEARCH_API_URL, params=params)
+
+def run_search_stages(pincode, interest):
+    """
+    Resolves district/state and lat/lng concurrently, then runs the textsearch
+    once both are ready. Returns (stage results, per-stage timings in ms).
+    """
+    return run_stages({
+        'district_state': (lambda: get_district_state(pincode), ()),
+        'geocode': (lambda: geocode_pincode(pincode), ()),
+        'textsearch': (
+            lambda district_state, geocode: text_search_places(interest, district_state, geocode),
+            ('district_state', 'geocode')
+        ),
+    })
+
+# --- Result stream ---
+
+@dataclass
+class SearchEvent:
+    """
+    One item of a search result stream:
+      error   - data is {"error": ...}; nothing follows
+      message - data is {"message": ...} when no places were found
+      place   - data is one place record, emitted as soon as it passes the pincode filter
+      meta    - data is {"lat", "lng", "timings"}; always last on success
+    """
+    kind: str
+    data: dict = field(default_factory=dict)
+    status: int = 200
+
+def get_map_link(place_name, address):
+    query = f"{place_name}, {address}".replace(" ", "+")
+    return f"https://www.google.com/maps/search/?api=1&query={query}"
+
+def search_request_error(pincode, interest):
+    if not pincode or not interest:
+        return SearchEvent('error', {"error": "PIN code and interest are required"}, 400)
+
+    if not API_KEY:
+        return SearchEvent('error', {"error": "GOMAPS API key is not configured"}, 500)
+
+    return None
+
+def iter_place_records(places, pincode, interest, district, state):
+    """Filter, transform and emit places in a single pass."""
+    # Strict pincode match, compiled once per request
+    pincode_pattern = re.compile(r'\b{}\b'.format(re.escape(str(pincode))))
+    description = f"A {interest.lower()} place in {district}, {state}."
+
+    for place in places:
+        address = place.get("formatted_address", "")
+        if not pincode_pattern.search(address):
+            continue
+
+        name = place.get("name", "Unknown Place")
+        address = address or "No address available"
+        place_type = ", ".join(place.get("types", [])).replace("_", " ").title()
+
+        # Use photo_reference from textsearch result
+        photo_url = DEFAULT_PHOTO_URL
+        photos = place.get("photos")
+        if photos:
+            ref = photos[0].get("photo_reference")
+            if ref:
+                photo_url = PHOTO_API_URL.format(ref, API_KEY)
+
+        yield {
+            "name": name,
+            "address": address,
+            "place_type": place_type,
+            "photo_reference": photo_url,
+            "description": description,
+            "map_link": get_map_link(name, address)
+        }
+
+def iter_search_events(pincode, interest, stage_results, timings):
+    """Turns the district/state, geocode and textsearch stage results into a SearchEvent stream."""
+    district_state = stage_results['district_state']
+    if not district_state:
+        yield SearchEvent('error', {"error": "Invalid PIN code"}, 404)
+        return
+    district, state = district_state
+
+    location, geo_status = stage_results['geocode']
+    if geo_status is None:
+        yield SearchEvent('error', {"error": "Geocode API response missing 'status'."}, 500)
+        return
+    if not location:
+        yield SearchEvent('error', {"error": f"Failed to geocode pincode: {geo_status}"}, 500)
+        return
+    lat, lng = location
+
+    search_response = stage_results['textsearch']
+    if search_response.status_code >= 400:
+        yield SearchEvent('error', {"error": "Failed to contact GOMAPS API"}, 500)
+        return
+
+    search_data = search_response.json()
+    if search_data.get("status") != "OK":
+        yield SearchEvent('error', {"error": f"GOMAPS API error: {search_data.get('status')}"}, 500)
+        return
+
+    places = search_data.get("results", [])
+    if not places:
+        yield SearchEvent('message', {"message": "No places found for your search criteria."})
+        return
+
+    for record in iter_place_records(places, pincode, interest, district, state):
+        yield SearchEvent('place', record)
+
+    yield SearchEvent('meta', {"lat": lat, "lng": lng, "timings": timings})
+
+def search_events(pincode, interest):
+    """Runs one search and yields its SearchEvent stream."""
+    error = search_request_error(pincode, interest)
+    if error:
+        yield error
+        return
+
+    try:
+        stage_results, timings = run_search_stages(pincode, interest)
+        yield from iter_search_events(pincode, interest, stage_results, timings)
+    except Exception as e:
+        print("Exception:", e)
+        yield SearchEvent('error', {"error": str(e)}, 500)
+
+def run_batch_search(pairs, include_timings=False, max_concurrency=BATCH_CONCURRENCY):
+    """
+    Runs many (pincode, interest) searches together and returns one result
+    dict per pair, in order, shaped like to_result_dict's output.
+
+    District/state and geocode lookups run once per distinct pincode and
+    identical pairs share one textsearch. All upstream calls go through
+    run_bounded, so at most max_concurrency are in flight for the batch.
+    """
+    results = [None] * len(pairs)
+    searches = {}  # (pincode, interest) -> indexes into pairs
+    for i, (pincode, interest) in enumerate(pairs):
+        error = search_request_error(pincode, interest)
+        if error:
+            results[i] = error.data
+        else:
+            searches.setdefault((pincode, interest.lower()), []).append(i)
+
+    pincodes = {pincode for pincode, _ in searches}
+    lookups = {}
+    for pincode in pincodes:
+        lookups[('district_state', pincode)] = lambda pincode=pincode: get_district_state(pincode)
+        lookups[('geocode', pincode)] = lambda pincode=pincode: geocode_pincode(pincode)
+    resolved = run_bounded(lookups, max_concurrency)
+
+    text_searches = {}
+    for pincode, interest in searches:
+        district_state, _, error = resolved[('district_state', pincode)]
+        geocode, _, geo_error = resolved[('geocode', pincode)]
+        if error or geo_error or not district_state or not geocode[0]:
+            continue
+        text_searches[(pincode, interest)] = (
+            lambda interest=interest, district_state=district_state, geocode=geocode:
+                text_search_places(interest, district_state, geocode)
+        )
+    responses = run_bounded(text_searches, max_concurrency)
+
+    for (pincode, interest), indexes in searches.items():
+        stage_results = {}
+        timings = {}
+        error = None
+        for name, outcome in (
+            ('district_state', resolved[('district_state', pincode)]),
+            ('geocode', resolved[('geocode', pincode)]),
+            ('textsearch', responses.get((pincode, interest), (None, None, None)))
+        ):
+            stage_results[name], ms, stage_error = outcome
+            error = error or stage_error
+            if ms is not None:
+                timings[name] = ms
+
+        if error:
+            print("Exception:", error)
+            result = {"error": str(error)}
+        else:
+            original_interest = pairs[indexes[0]][1]
+            events = iter_search_events(pincode, original_interest, stage_results, timings)
+            result = to_result_dict(events, include_timings)
+        for i in indexes:
+            results[i] = result
+    return results
+
+# --- Output adapters ---
+
+class ResultCollector:
+    """
+    Builds the search result dict from events as they pass. Only the place
+    records (which the cached result needs), the final meta and the first
+    error are kept.
+    """
+
+    def __init__(self, include_timings=False):
+        self.include_timings = include_timings
+        self.records = []
+        self.final = None
+
+    @property
+    def done(self):
+        return self.final is not None
+
+    def add(self, event):
+        if self.done:
+            return
+        if event.kind == 'place':
+            self.records.append(event.data)
+        elif event.kind == 'meta':
+            self.final = {"results": self.records, "lat": event.data["lat"], "lng": event.data["lng"]}
+            if self.include_timings:
+                self.final["timings"] = event.data["timings"]
+        else:
+            self.final = event.data
+
+    def fail(self, error):
+        if not self.done:
+            self.final = {"error": str(error)}
+
+    def result(self):
+        return self.final if self.done else {"error": "Search ended without a result"}
+
+def close_events(events):
+    """Closes an event generator early so its cleanup (e.g. tee_result's on_result) runs now."""
+    close = getattr(events, "close", None)
+    if close:
+        close()
+
+def to_result_dict(events, include_timings=False):
+    """Collects an event stream into the search result dict used by the JSON routes."""
+    collector = ResultCollector(include_timings)
+    try:
+        for event in events:
+            collector.add(event)
+            if collector.done:
+                break
+    except Exception as e:
+        collector.fail(e)
+    return collector.result()
+
+def to_flask_response(events, include_timings=False):
+    """Like to_result_dict, but errors become (response, status) pairs."""
+    first_error = None
+
+    def capture(events):
+        nonlocal first_error
+        for event in events:
+            if event.kind == 'error':
+                first_error = event
+            yield event
+
+    result = to_result_dict(capture(events), include_timings)
+    if first_error:
+        return jsonify(first_error.data), first_error.status
+    if "error" in result:
+        return jsonify(result), 500
+    return result
+
+def to_ndjson(events):
+    """Yields one JSON line per event: {"type": kind, ...data}."""
+    try:
+        for event in events:
+            yield json.dumps({"type": event.kind, **event.data}) + "\n"
+    except Exception as e:
+        yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+    finally:
+        # Runs on client disconnect too, when the server closes this generator
+        close_events(events)
+
+def to_sse(events):
+    """Yields one Server-Sent Event per SearchEvent, named after its kind."""
+    try:
+        for event in events:
+            yield f"event: {event.kind}\ndata: {json.dumps(event.data)}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    finally:
+        close_events(events)
+
+# Streamed search formats: name -> (content type, encoder)
+STREAM_FORMATS = {
+    "ndjson": ("application/x-ndjson", to_ndjson),
+    "sse": ("text/event-stream", to_sse),
+}
+
+def requested_stream_format(data, accept=""):
+    """
+    Returns 'ndjson' or 'sse' when the client asked for a streamed search via
+    {"stream": "ndjson" | "sse" | true} or the Accept header, else None.
+    """
+    stream = data.get("stream")
+    if stream in STREAM_FORMATS:
+        return stream
+    if "text/event-stream" in accept:
+        return "sse"
+    if stream is True or "application/x-ndjson" in accept:
+        return "ndjson"
+    return None
+
+def split_first_error(events):
+    """
+    Returns (error_event, events). Pulls the first event so a search that fails
+    before producing anything can still get a plain error response; otherwise
+    error_event is None and events is the complete stream.
+    """
+    events = iter(events)
+    first = next(events, None)
+    if first is None or first.kind == 'error':
+        # Nothing will be streamed; finish the source now
+        close_events(events)
+        if first is None:
+            return SearchEvent('error', {"error": "Search ended without a result"}, 500), iter(())
+        return first, iter(())
+    return None, _prepend(first, events)
+
+def _prepend(first, events):
+    try:
+        yield first
+        yield from events
+    finally:
+        close_events(events)
+
+def tee_result(events, on_result, include_timings=False):
+    """
+    Passes events through and calls on_result with their to_result_dict form.
+    on_result also runs when the consumer stops early (client disconnect,
+    error sent up front), with the result so far.
+    """
+    collector = ResultCollector(include_timings)
+    finished = False
+    try:
+        for event in events:
+            collector.add(event)
+            yield event
+        finished = True
+    except Exception as e:
+        collector.fail(e)
+        raise
+    finally:
+        close_events(events)
+        if not finished:
+            collector.fail("Search stream closed before the search finished")
+        on_result(collector.result())
+
+def result_events(result):
+    """Replays a search result dict, e.g. a cached one, as a SearchEvent stream."""
+    if "error" in result:
+        yield SearchEvent('error', result, 500)
+        return
+    if "message" in result:
+        yield SearchEvent('message', result)
+        return
+    for record in result.get("results", []):
+        yield SearchEvent('place', record)
+    yield SearchEvent('meta', {"lat": result.get("lat"), "lng": result.get("lng"), "timings": result.get("timings", {})})
+
+def search_cache_key(pincode, interest):
+    return f"{str(pincode).strip()}:{interest.strip().lower()}"
+
+def is_cacheable_search(result):
+    # Only successful searches are cached; errors and empty results are retried
+    return isinstance(result, dict) and "results" in result
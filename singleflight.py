@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalesce within the process only
+    fcntl = None
+
+SINGLEFLIGHT_DIR = os.environ.get(
+    "SINGLEFLIGHT_DIR", os.path.join(tempfile.gettempdir(), "discover-places-singleflight")
+)
+# How long a result written by another worker may be reused by waiters
+SHARED_RESULT_TTL_SECONDS = 30
+LOCK_TIMEOUT_SECONDS = 30
+LOCK_POLL_SECONDS = 0.02
+PRUNE_EVERY_WRITES = 500
+
+class SingleFlight:
+    """
+    Request coalescing for identical concurrent work.
+
+    Within a process, the first caller for a key runs fn and concurrent
+    callers wait on the same future. Across processes on one host, the leader
+    holds an flock on a per-key lock file while it works and publishes the
+    result to a file next to it; leaders in other workers block on that lock
+    and then reuse the published result instead of repeating the work.
+    """
+
+    def __init__(self, lock_dir=SINGLEFLIGHT_DIR, result_ttl=SHARED_RESULT_TTL_SECONDS,
+                 lock_timeout=LOCK_TIMEOUT_SECONDS):
+        self.lock_dir = lock_dir if fcntl else None
+        self.result_ttl = result_ttl
+        self.lock_timeout = lock_timeout
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._tasks = {}
+        self._writes = 0
+        self.leaders = 0
+        self.followers = 0
+        self.shared_hits = 0
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    # --- Cross-process coordination ---
+
+    def _path(self, key, suffix):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.lock_dir, digest + suffix)
+
+    @staticmethod
+    def _try_lock(handle):
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _acquire(self, key):
+        """Returns an open, flocked lock file, or None if locking is unavailable or timed out."""
+        if not self.lock_dir:
+            return None
+        handle = open(self._path(key, ".lock"), "a+")
+        deadline = time.monotonic() + self.lock_timeout
+        while not self._try_lock(handle):
+            if time.monotonic() >= deadline:
+                # Give up on coordination rather than stall the request
+                handle.close()
+                return None
+            time.sleep(LOCK_POLL_SECONDS)
+        return handle
+
+    async def _acquire_async(self, key):
+        """
+        _acquire for the event loop. Polls with asyncio.sleep instead of
+        holding a default-executor thread, which run_sync needs, while waiting.
+        """
+        if not self.lock_dir:
+            return None
+        handle = open(self._path(key, ".lock"), "a+")
+        deadline = time.monotonic() + self.lock_timeout
+        try:
+            while not self._try_lock(handle):
+                if time.monotonic() >= deadline:
+                    handle.close()
+                    return None
+                await asyncio.sleep(LOCK_POLL_SECONDS)
+        except BaseException:
+            # Cancelled while waiting: do not leak the file handle
+            handle.close()
+            raise
+        return handle
+
+    @staticmethod
+    def _release(handle):
+        if handle is not None:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+    def _read_shared(self, key):
+        if not self.lock_dir:
+            return None
+        path = self._path(key, ".json")
+        try:
+            if time.time() - os.path.getmtime(path) > self.result_ttl:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_shared(self, key, value):
+        if not self.lock_dir:
+            return
+        path = self._path(key, ".json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "value": value}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print("Error publishing single-flight result:", str(e))
+            return
+        self._writes += 1
+        if self._writes % PRUNE_EVERY_WRITES == 0:
+            self._prune()
+
+    def _prune(self):
+        cutoff = time.time() - self.result_ttl * 10
+        for name in os.listdir(self.lock_dir):
+            path = os.path.join(self.lock_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    # --- Threads ---
+
+    def do(self, key, fn, should_share=None):
+        """
+        Run fn() once for all concurrent callers of key and return its result.
+        Only results for which should_share(value) is true are published to
+        other workers (they must be JSON serializable).
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._futures[key] = future
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = self._lead(key, fn, should_share)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._futures.pop(key, None)
+
+    def _lead(self, key, fn, should_share):
+        handle = self._acquire(key)
+        try:
+            shared = self._read_shared(key)
+            if shared is not None:
+                self._count("shared_hits")
+                return shared
+            value = fn()
+            if handle is not None and (should_share is None or should_share(value)):
+                self._write_shared(key, value)
+            return value
+        finally:
+            self._release(handle)
+
+    # --- asyncio ---
+
+    async def do_async(self, key, coro_fn, should_share=None):
+        """asyncio counterpart of do; coro_fn is a coroutine function."""
+        task = self._tasks.get(key)
+        if task is None:
+            self._count("leaders")
+            task = asyncio.ensure_future(self._lead_async(key, coro_fn, should_share))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        else:
+            self._count("followers")
+        # Shield so one cancelled waiter does not cancel the shared work
+        return await asyncio.shield(task)
+
+    async def _lead_async(self, key, coro_fn, should_share):
+        handle = await self._acquire_async(key)
+        try:
+            shared = self._read_shared(key)
+            if shared is not None:
+                self._count("shared_hits")
+                return shared
+            value = await coro_fn()
+            if handle is not None and (should_share is None or should_share(value)):
+                self._write_shared(key, value)
+            return value
+        finally:
+            self._release(handle)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._futures) + len(self._tasks),
+                "leaders": self.leaders,
+                "followers": self.followers,
+                "shared_hits": self.shared_hits,
+                "cross_process": bool(self.lock_dir)
+            }
+
+search_flight = SingleFlight()
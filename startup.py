@@ -0,0 +1,97 @@
+"""
+Deferred initialisation of the app's slow-to-load parts (database schema,
+neural recommender, collaborative recommender).
+
+STARTUP_MODE chooses when they load:
+    eager       at import, before the worker serves anything (old behaviour)
+    background  in a warm-up thread started at import; requests that need a
+                component before it is ready wait for it (default)
+    lazy        on first use only
+
+/ready reports each component's state so load balancers only route to
+workers that have finished warming up.
+"""
+import os
+import threading
+import time
+
+STARTUP_MODE = os.environ.get("STARTUP_MODE", "background")
+# A failed load is retried by the next caller after this long
+RETRY_SECONDS = 30
+
+# Every component by name, in registration (= warm-up) order
+components = {}
+
+class LazyComponent:
+    """
+    A value produced by `loader` on first use. Concurrent callers wait for the
+    one load in progress. A failed load is recorded, get() returns None, and
+    the load is retried once RETRY_SECONDS have passed.
+    """
+
+    def __init__(self, name, loader, required=True):
+        self.name = name
+        self.loader = loader
+        self.required = required
+        self._lock = threading.Lock()
+        self.value = None
+        self.state = "pending"
+        self.error = None
+        self.load_ms = None
+        self._failed_at = None
+        components[name] = self
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def _backing_off(self):
+        return self.state == "failed" and time.monotonic() - self._failed_at < RETRY_SECONDS
+
+    def get(self):
+        if self.ready:
+            return self.value
+        if self._backing_off():
+            return None
+        with self._lock:
+            if not self.ready and not self._backing_off():
+                self.state = "loading"
+                started = time.perf_counter()
+                try:
+                    self.value = self.loader()
+                    self.state = "ready"
+                    self.error = None
+                except Exception as e:
+                    print(f"Error loading {self.name}:", str(e))
+                    self.state = "failed"
+                    self.error = str(e)
+                    self._failed_at = time.monotonic()
+                self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+        return self.value
+
+    def status(self):
+        return {"state": self.state, "required": self.required, "load_ms": self.load_ms, "error": self.error}
+
+def warm_up():
+    started = time.perf_counter()
+    for component in list(components.values()):
+        component.get()
+    print(f"Warm-up finished in {time.perf_counter() - started:.1f}s:",
+          {name: component.state for name, component in components.items()})
+
+def start(mode=STARTUP_MODE):
+    """Called once the app has registered its components."""
+    if mode == "eager":
+        warm_up()
+    elif mode == "background":
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+def readiness(mode=STARTUP_MODE):
+    """
+    (is_ready, per-component status). Optional components never block
+    readiness; in lazy mode components that have not been used yet do not either.
+    """
+    status = {name: component.status() for name, component in components.items()}
+    accepted = ("ready", "pending") if mode == "lazy" else ("ready",)
+    ready = all(component.state in accepted for component in components.values() if component.required)
+    return ready, status
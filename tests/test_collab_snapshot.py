@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from collab_snapshot import current_version, load_or_build, load_snapshot
+from People_also_search_for import CollaborativeRecommender
+
+def make_build_fn(builds):
+    def build_fn():
+        builds.append(1)
+        rng = np.random.default_rng(len(builds))
+        model = CollaborativeRecommender(load=False, k=3)
+        model.build(
+            [f"interest{i}" for i in rng.integers(0, 8, 200)],
+            [f"{110000 + j}" for j in rng.integers(0, 20, 200)]
+        )
+        return model
+    return build_fn
+
+def neighbours(model):
+    return {interest: model.get_similar_interests(interest) for interest in model.unique_interests}
+
+def test_second_worker_loads_instead_of_building(tmp_path):
+    builds = []
+    build_fn = make_build_fn(builds)
+    first = load_or_build(build_fn, None, tmp_path)
+    second = load_or_build(build_fn, None, tmp_path)
+    assert len(builds) == 1
+    assert second is not first
+    assert second.snapshot_version == first.snapshot_version == current_version(tmp_path)
+    assert neighbours(second) == neighbours(first)
+
+def test_fresh_snapshot_keeps_the_current_model(tmp_path):
+    builds = []
+    build_fn = make_build_fn(builds)
+    first = load_or_build(build_fn, None, tmp_path)
+    second = load_or_build(build_fn, None, tmp_path)
+    # Both workers' refreshes within the interval keep what they have
+    assert load_or_build(build_fn, first, tmp_path) is first
+    assert load_or_build(build_fn, second, tmp_path) is second
+    assert len(builds) == 1
+
+def test_only_a_stale_snapshot_is_rebuilt(tmp_path):
+    builds = []
+    build_fn = make_build_fn(builds)
+    first = load_or_build(build_fn, None, tmp_path)
+    second = load_or_build(build_fn, None, tmp_path)
+    rebuilt = load_or_build(build_fn, second, tmp_path, max_age_seconds=0)
+    assert len(builds) == 2
+    assert rebuilt.snapshot_version != first.snapshot_version
+    # The other worker picks up the new snapshot without building again
+    loaded = load_or_build(build_fn, first, tmp_path)
+    assert len(builds) == 2
+    assert loaded.snapshot_version == rebuilt.snapshot_version
+    assert neighbours(loaded) == neighbours(rebuilt)
+
+def test_increments_leave_the_mapped_counts_untouched(tmp_path):
+    builds = []
+    built = load_or_build(make_build_fn(builds), None, tmp_path)
+    model = load_snapshot(built.snapshot_version, tmp_path)
+    base = model.interest_pincode_matrix
+    data = base.data.copy()
+    assert not base.data.flags.writeable
+
+    extra = [("interest1", "110003", 2), ("interest9", "110003", 1), ("interest2", "119999", 3)]
+    for interest, pincode, count in extra:
+        model.add_pair(interest, pincode, count)
+        built.add_pair(interest, pincode, count)
+    model.get_similar_interests("interest1")
+    assert model.interest_pincode_matrix is base
+    np.testing.assert_array_equal(base.data, data)
+
+    # Scored as if the increments had been merged into the counts
+    rebuilt = CollaborativeRecommender(load=False, k=3)
+    counts = built.counts().tocoo()
+    rebuilt.build(
+        np.array(built.unique_interests)[counts.row], np.array(built.unique_pincodes)[counts.col], counts.data
+    )
+    assert sorted(model.unique_interests) == rebuilt.unique_interests
+    for interest in ("interest1", "interest9", "interest2"):
+        i, j = model.interest_index[interest], rebuilt.interest_index[interest]
+        scores = {model.unique_interests[n]: score for n, score in model.interest_neighbours.lookup(i, 3)}
+        expected = {rebuilt.unique_interests[n]: score for n, score in rebuilt.interest_neighbours.lookup(j, 3)}
+        assert sorted(scores.values()) == pytest.approx(sorted(expected.values()), abs=1e-5)
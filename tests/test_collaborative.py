@@ -0,0 +1,197 @@
+import numpy as np
+import pytest
+
+import People_also_search_for
+from People_also_search_for import CollaborativeRecommender, CollaborativeRefresher, NeighbourIndex, _normalize_rows
+
+def random_pairs(rng, n, interests=12, pincodes=40):
+    """Pairs with real-valued counts, so similarities do not tie."""
+    return (
+        [f"interest{i}" for i in rng.integers(0, interests, n)],
+        [f"{110000 + j}" for j in rng.integers(0, pincodes, n)],
+        (rng.random(n) + 0.5).tolist()
+    )
+
+def neighbour_scores(model, k):
+    """{item: {neighbour: score}} per side; dicts, since pincodes seen with one interest tie."""
+    model._refresh_neighbours()
+    return [
+        {names[item]: {names[j]: score for j, score in index.lookup(item, k)} for item in range(len(names))}
+        for names, index in (
+            (model.unique_interests, model.interest_neighbours),
+            (model.unique_pincodes, model.pincode_neighbours)
+        )
+    ]
+
+def cosine(matrix):
+    normalized = _normalize_rows(matrix).toarray()
+    return normalized @ normalized.T
+
+@pytest.mark.parametrize("k", [3, 60])
+def test_neighbour_index_build_keeps_top_k(k):
+    rng = np.random.default_rng(0)
+    model = CollaborativeRecommender(load=False, k=k)
+    model.build(*random_pairs(rng, 200))
+    similarities = cosine(model.interest_pincode_matrix)
+    for item in range(len(model.unique_interests)):
+        row = similarities[item].copy()
+        row[item] = -np.inf
+        expected = [j for j in np.argsort(-row)[:k] if row[j] > 0]
+        assert [j for j, _ in model.interest_neighbours.lookup(item, k)] == expected
+
+def test_update_with_unchanged_similarities_matches_build():
+    rng = np.random.default_rng(1)
+    model = CollaborativeRecommender(load=False, k=4)
+    model.build(*random_pairs(rng, 200))
+    similarities = cosine(model.interest_pincode_matrix)
+    index = NeighbourIndex(len(similarities), 4)
+    for item, row in enumerate(similarities):
+        index.update(item, row)
+    for item in range(len(similarities)):
+        assert dict(index.lookup(item, 4)) == pytest.approx(dict(model.interest_neighbours.lookup(item, 4)))
+
+def test_incremental_pairs_match_a_full_build():
+    # With k above the item count nothing is ever evicted, so lists must match exactly
+    rng = np.random.default_rng(2)
+    base, extra = random_pairs(rng, 300), random_pairs(rng, 80, interests=15, pincodes=50)
+    incremental = CollaborativeRecommender(load=False, k=60)
+    incremental.build(*base)
+    for interest, pincode, count in zip(*extra):
+        incremental.add_pair(interest, pincode, count)
+    rebuilt = CollaborativeRecommender(load=False, k=60)
+    rebuilt.build(*(a + b for a, b in zip(base, extra)))
+    for incremental_side, rebuilt_side in zip(neighbour_scores(incremental, 60), neighbour_scores(rebuilt, 60)):
+        assert incremental_side.keys() == rebuilt_side.keys()
+        for item, neighbours in incremental_side.items():
+            assert neighbours == pytest.approx(rebuilt_side[item], abs=1e-5)
+
+def test_incremental_scores_stay_exact_with_small_k():
+    rng = np.random.default_rng(3)
+    base, extra = random_pairs(rng, 300), random_pairs(rng, 30, interests=14)
+    model = CollaborativeRecommender(load=False, k=3)
+    model.build(*base)
+    for interest, pincode, count in zip(*extra):
+        model.add_pair(interest, pincode, count)
+    model.get_similar_interests("interest0")
+    rebuilt = CollaborativeRecommender(load=False, k=3)
+    rebuilt.build(*(a + b for a, b in zip(base, extra)))
+    similarities = cosine(rebuilt.interest_pincode_matrix)
+    index = [rebuilt.interest_index[interest] for interest in model.unique_interests]
+    for item, interest in enumerate(model.unique_interests):
+        # Listed scores are always current, though a dropped neighbour may linger until the next build
+        for neighbour, score in model.interest_neighbours.lookup(item, 3):
+            assert score == pytest.approx(similarities[index[item], index[neighbour]], abs=1e-5)
+    for interest in set(extra[0]):
+        # Items touched by the new pairs get their own list rebuilt
+        assert model.get_similar_interests(interest, 3) == rebuilt.get_similar_interests(interest, 3)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(People_also_search_for.time, "time", clock)
+    return clock
+
+class FakeModel:
+    unique_interests = unique_pincodes = ()
+
+    def __init__(self, built_at=None):
+        self.pairs = []
+        if built_at is not None:
+            self.snapshot_built_at = built_at
+
+    def add_pair(self, interest, pincode, count=1):
+        self.pairs.append((interest, pincode))
+
+def test_poll_replays_pairs_recorded_after_the_snapshot(clock):
+    published = FakeModel(built_at=120)
+    refresher = CollaborativeRefresher("poll-test", FakeModel, poll_fn=lambda current: published)
+    refresher.refresh()
+    clock.now = 110
+    refresher.record("food", "110001")  # Already in the published snapshot
+    clock.now = 130
+    refresher.record("parks", "110002")
+    refresher._poll()
+    assert refresher.current is published
+    assert published.pairs == [("parks", "110002")]
+    assert refresher.stats()["recorded_since_build"] == 1
+
+def test_poll_without_a_newer_model_keeps_current(clock):
+    refresher = CollaborativeRefresher("poll-none-test", FakeModel, poll_fn=lambda current: None)
+    model = refresher.refresh()
+    refresher.record("food", "110001")
+    refresher._poll()
+    assert refresher.current is model and model.pairs == [("food", "110001")]
+
+def test_refresh_replays_pairs_the_loaded_snapshot_predates(clock):
+    def load_older_snapshot():
+        clock.now = 125
+        refresher.record("shopping", "110003")  # Recorded while the build runs
+        return FakeModel(built_at=105)
+
+    refresher = CollaborativeRefresher("refresh-test", FakeModel)
+    refresher.refresh()
+    clock.now = 103
+    refresher.record("food", "110001")
+    clock.now = 110
+    refresher.record("parks", "110002")
+    refresher.build_fn = load_older_snapshot
+    clock.now = 120
+    model = refresher.refresh()
+    assert model.pairs == [("parks", "110002"), ("shopping", "110003")]
+    assert refresher.stats()["recorded_since_build"] == 2
+
+def test_refresh_keeping_the_current_model_does_not_replay(clock):
+    refresher = CollaborativeRefresher("keep-test", FakeModel)
+    model = refresher.refresh()
+    refresher.build_fn = lambda: refresher.current
+    clock.now = 110
+    refresher.record("food", "110001")
+    assert refresher.refresh() is model
+    assert model.pairs == [("food", "110001")]
+    assert refresher.stats()["recorded_since_build"] == 0
+
+def test_item_added_after_the_last_refresh_has_no_neighbours_yet(monkeypatch):
+    model = CollaborativeRecommender(load=False, k=3)
+    model.build(*random_pairs(np.random.default_rng(4), 100))
+    # As if add_pair ran on another thread between the refresh and the lookup
+    monkeypatch.setattr(model, "_refresh_neighbours", lambda: None)
+    model.add_pair("new interest", "999999")
+    assert model.get_similar_interests("new interest") == []
+    assert model.get_similar_pincodes("999999") == []
+    monkeypatch.undo()
+    model.add_pair("new interest", model.unique_pincodes[0])
+    assert model.get_similar_interests("new interest")
+
+def test_record_does_not_hold_the_refresher_lock_during_add_pair(clock):
+    class BusyModel(FakeModel):
+        def add_pair(self, interest, pincode, count=1):
+            # A neighbour refresh in progress would block here; stats must stay available
+            assert refresher._lock.acquire(blocking=False)
+            refresher._lock.release()
+            super().add_pair(interest, pincode, count)
+
+    refresher = CollaborativeRefresher("record-lock-test", BusyModel)
+    model = refresher.refresh()
+    refresher.record("food", "110001")
+    assert model.pairs == [("food", "110001")]
+
+def test_pair_recorded_during_a_swap_reaches_the_new_model(clock):
+    published = FakeModel(built_at=50)
+
+    class SwappedOutModel(FakeModel):
+        def add_pair(self, interest, pincode, count=1):
+            refresher._poll()  # Another thread swaps in a new model before this add_pair runs
+            super().add_pair(interest, pincode, count)
+
+    refresher = CollaborativeRefresher("record-swap-test", SwappedOutModel, poll_fn=lambda current: published)
+    refresher.refresh()
+    refresher.record("food", "110001")
+    assert refresher.current is published
+    assert published.pairs == [("food", "110001")]
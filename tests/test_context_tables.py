@@ -0,0 +1,32 @@
+import numpy as np
+
+from context_features import DAYS_OF_WEEK, HOURS, SEASONS
+from context_tables import IS_DAY, cell_index, context_grid, top_k_pairs
+
+def test_cell_index_matches_context_grid_rows():
+    n_weather = 5
+    hour, day_of_week, season, weather, is_day = context_grid(n_weather)
+    assert len(hour) == HOURS * DAYS_OF_WEEK * len(SEASONS) * n_weather * len(IS_DAY)
+    rows = [
+        cell_index(h, d, s, w, i, n_weather)
+        for h, d, s, w, i in zip(hour.tolist(), day_of_week.tolist(), season.tolist(), weather.tolist(), is_day.tolist())
+    ]
+    assert rows == list(range(len(hour)))
+
+def test_cell_index_accepts_bool_is_day():
+    hour, day_of_week, season, weather, is_day = context_grid(3)
+    row = cell_index(13, 5, SEASONS[2], 1, True, 3)
+    assert (hour[row], day_of_week[row], season[row], weather[row], is_day[row]) == (13, 5, SEASONS[2], 1, 1)
+
+def test_top_k_pairs_matches_brute_force():
+    rng = np.random.default_rng(0)
+    interest_probs = rng.random((20, 6))
+    pincode_probs = rng.random((20, 9))
+    interest_idx, pincode_idx, scores = top_k_pairs(interest_probs, pincode_probs, 3)
+    for row in range(20):
+        joint = np.outer(interest_probs[row], pincode_probs[row])
+        expected = np.sort(joint.ravel())[::-1][:3]
+        np.testing.assert_allclose(scores[row], expected)
+        np.testing.assert_allclose(interest_probs[row, interest_idx[row]] * pincode_probs[row, pincode_idx[row]], scores[row])
+        # The best pair is each head's argmax, which live inference returns
+        assert (interest_idx[row, 0], pincode_idx[row, 0]) == (interest_probs[row].argmax(), pincode_probs[row].argmax())
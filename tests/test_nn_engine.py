@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from nn_engine import NumpyRecommender, fold_weights, random_inputs
+
+USERS, INTERESTS, PINCODES, WEATHER = 50, 8, 30, 6
+
+@pytest.fixture
+def raw():
+    """Random weights shaped like create_model's layers."""
+    rng = np.random.default_rng(1)
+    normal = lambda *shape: rng.normal(scale=0.3, size=shape)
+    return {
+        "embedding_user_id": normal(USERS, 8),
+        "embedding_weather": normal(WEATHER, 4),
+        "embedding_last_interest": normal(INTERESTS, 8),
+        "dense1": (normal(26, 64), normal(64)),
+        "batch_norm": (rng.random(64) + 0.5, normal(64), normal(64), rng.random(64) + 0.1, 1e-3),
+        "dense2": (normal(64, 32), normal(32)),
+        "interest_hidden": (normal(32, 32), normal(32)),
+        "interest_output": (normal(32, INTERESTS), normal(INTERESTS)),
+        "pincode_hidden": (normal(32, 32), normal(32)),
+        "pincode_output": (normal(32, PINCODES), normal(PINCODES)),
+    }
+
+def reference_predict(raw, inputs):
+    """The unfolded forward pass: concat -> Dense+ReLU -> BatchNorm -> Dense+ReLU -> two heads."""
+    user, hour, day, season, weather, is_day, lat, lon, interest = [np.asarray(x) for x in inputs]
+    x = np.concatenate([
+        raw["embedding_user_id"][user],
+        raw["embedding_weather"][weather],
+        raw["embedding_last_interest"][interest],
+        np.stack([hour, day, season, is_day, lat, lon], axis=1),
+    ], axis=1)
+    x = np.maximum(x @ raw["dense1"][0] + raw["dense1"][1], 0)
+    gamma, beta, mean, variance, epsilon = raw["batch_norm"]
+    x = gamma * (x - mean) / np.sqrt(variance + epsilon) + beta
+    x = np.maximum(x @ raw["dense2"][0] + raw["dense2"][1], 0)
+    outputs = []
+    for head in ("interest", "pincode"):
+        hidden = np.maximum(x @ raw[head + "_hidden"][0] + raw[head + "_hidden"][1], 0)
+        logits = hidden @ raw[head + "_output"][0] + raw[head + "_output"][1]
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        outputs.append(exp / exp.sum(axis=1, keepdims=True))
+    return outputs
+
+@pytest.mark.parametrize("rows", [1, 300])
+def test_folded_engine_matches_reference_forward_pass(raw, rows):
+    engine = NumpyRecommender(fold_weights(raw))
+    inputs = [x[:rows] for x in random_inputs(engine, 300)]
+    for actual, expected in zip(engine.predict(inputs), reference_predict(raw, inputs)):
+        assert actual.shape == expected.shape
+        np.testing.assert_allclose(actual, expected, atol=1e-5)
+
+def test_npz_round_trip(raw, tmp_path):
+    path = tmp_path / "model.npz"
+    np.savez(path, **fold_weights(raw))
+    engine = NumpyRecommender.load(path)
+    inputs = random_inputs(engine, 20)
+    for loaded, direct in zip(engine.predict(inputs), NumpyRecommender(fold_weights(raw)).predict(inputs)):
+        np.testing.assert_array_equal(loaded, direct)
+
+def test_oov_row_is_the_mean_projection(raw):
+    engine = NumpyRecommender(fold_weights(raw))
+    assert engine.vocab_sizes == {"user_id": USERS, "weather": WEATHER, "last_interest": INTERESTS}
+    table = engine.weights["proj_user_id"]
+    np.testing.assert_allclose(table[USERS], table[:USERS].mean(axis=0), rtol=1e-5, atol=1e-6)
+
+def test_unsupported_format_is_rejected(raw):
+    weights = fold_weights(raw)
+    weights["format_version"] = np.array(99)
+    with pytest.raises(ValueError):
+        NumpyRecommender(weights)
@@ -0,0 +1,63 @@
+from search_pipeline import (
+    SearchEvent, result_events, split_first_error, tee_result, to_ndjson, to_result_dict
+)
+
+def search_stream(n=3):
+    for i in range(n):
+        yield SearchEvent('place', {"name": f"place {i}"})
+    yield SearchEvent('meta', {"lat": 28.6, "lng": 77.2, "timings": {"total": 1.0}})
+
+def test_to_result_dict_collects_places_and_meta():
+    result = to_result_dict(search_stream(2), include_timings=True)
+    assert result == {
+        "results": [{"name": "place 0"}, {"name": "place 1"}],
+        "lat": 28.6, "lng": 77.2, "timings": {"total": 1.0}
+    }
+
+def test_to_result_dict_returns_first_error():
+    events = iter([SearchEvent('error', {"error": "bad pincode"}, 400), SearchEvent('meta', {})])
+    assert to_result_dict(events) == {"error": "bad pincode"}
+
+def test_result_events_round_trip():
+    result = to_result_dict(search_stream(2))
+    assert to_result_dict(result_events(result)) == result
+
+def test_tee_result_reports_the_complete_result():
+    results = []
+    events = list(tee_result(search_stream(3), results.append))
+    assert len(events) == 4
+    assert results == [to_result_dict(search_stream(3))]
+
+def test_tee_result_reports_when_consumer_stops_early():
+    results = []
+    source_closed = []
+
+    def source():
+        try:
+            yield from search_stream(5)
+        finally:
+            source_closed.append(True)
+
+    stream = to_ndjson(tee_result(source(), results.append))
+    next(stream)
+    next(stream)
+    # The server closes the body iterator when the client disconnects
+    stream.close()
+    assert source_closed == [True]
+    assert len(results) == 1
+    assert "results" not in results[0] and "error" in results[0]
+
+def test_up_front_error_still_reports_result():
+    results = []
+    events = iter([SearchEvent('error', {"error": "bad pincode"}, 400)])
+    error, rest = split_first_error(tee_result(events, results.append))
+    assert error.data == {"error": "bad pincode"}
+    assert list(rest) == []
+    assert results == [{"error": "bad pincode"}]
+
+def test_split_first_error_passes_a_good_stream_through():
+    results = []
+    error, rest = split_first_error(tee_result(search_stream(2), results.append))
+    assert error is None
+    assert [event.kind for event in rest] == ['place', 'place', 'meta']
+    assert results[0]["results"] == [{"name": "place 0"}, {"name": "place 1"}]
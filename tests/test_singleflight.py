@@ -0,0 +1,74 @@
+import asyncio
+import threading
+
+import pytest
+
+import singleflight
+from singleflight import SingleFlight
+
+pytestmark = pytest.mark.skipif(singleflight.fcntl is None, reason="needs fcntl")
+
+def test_do_runs_fn_once_for_concurrent_callers(tmp_path):
+    flight = SingleFlight(lock_dir=str(tmp_path))
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"value": 42}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", fn)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", fn))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    assert calls == [1]
+    assert results == [{"value": 42}] * 4
+
+def test_second_instance_reuses_published_result(tmp_path):
+    first = SingleFlight(lock_dir=str(tmp_path))
+    second = SingleFlight(lock_dir=str(tmp_path))
+    assert first.do("k", lambda: [1, 2]) == [1, 2]
+    assert second.do("k", lambda: pytest.fail("should reuse the shared result")) == [1, 2]
+    assert second.stats()["shared_hits"] == 1
+
+def test_async_lock_wait_does_not_use_executor_threads(tmp_path, monkeypatch):
+    flight = SingleFlight(lock_dir=str(tmp_path), lock_timeout=5)
+    # Another worker holds the key's lock
+    other = SingleFlight(lock_dir=str(tmp_path))
+    handle = other._acquire("k")
+
+    def no_threads(*args, **kwargs):
+        raise AssertionError("lock wait must not run in a thread")
+    monkeypatch.setattr(asyncio, "to_thread", no_threads)
+
+    async def main():
+        async def work():
+            return "computed"
+        task = asyncio.ensure_future(flight.do_async("k", work))
+        await asyncio.sleep(0.1)
+        # The loop stays responsive while the follower waits for the lock
+        assert not task.done()
+        other._release(handle)
+        return await task
+
+    assert asyncio.run(main()) == "computed"
+
+def test_async_lock_wait_times_out(tmp_path):
+    flight = SingleFlight(lock_dir=str(tmp_path), lock_timeout=0.1)
+    other = SingleFlight(lock_dir=str(tmp_path))
+    handle = other._acquire("k")
+    try:
+        async def work():
+            return "uncoordinated"
+        assert asyncio.run(flight.do_async("k", work)) == "uncoordinated"
+    finally:
+        other._release(handle)
@@ -0,0 +1,184 @@
+import asyncio
+
+import httpx
+import pytest
+import requests
+
+import upstream
+from upstream import AsyncUpstreamClient, CircuitBreaker, CircuitOpenError, UpstreamClient
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(upstream.time, "monotonic", clock)
+    return clock
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+def test_breaker_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+def test_half_open_allows_a_single_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    open_breaker(breaker)
+    clock.now += 30
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+def test_half_open_trial_success_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+def test_half_open_trial_failure_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    clock.now += 30
+    assert breaker.allow()
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def close(self):
+        pass
+
+def half_open_client(clock, error):
+    client = UpstreamClient("test", timeout=(1, 1), retries=2)
+    client._backoff = lambda attempt: None
+    open_breaker(client.breaker)
+    clock.now += client.breaker.reset_timeout
+
+    def get(url, params=None, **kwargs):
+        raise error
+    client.session.get = get
+    return client
+
+@pytest.mark.parametrize("error", [
+    requests.exceptions.ChunkedEncodingError("truncated"),
+    requests.exceptions.ContentDecodingError("bad gzip"),
+    requests.exceptions.TooManyRedirects("loop"),
+])
+def test_upstream_error_in_half_open_trial_reopens(clock, error):
+    client = half_open_client(clock, error)
+    with pytest.raises(type(error)):
+        client.get("https://example.invalid")
+    # The trial counted as a failure: open again, and a new trial after the timeout
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.get("https://example.invalid")
+    clock.now += client.breaker.reset_timeout
+    client.session.get = lambda url, params=None, **kwargs: FakeResponse(200)
+    assert client.get("https://example.invalid").status_code == 200
+    assert client.breaker.state == "closed"
+
+@pytest.mark.parametrize("error", [KeyboardInterrupt(), ValueError("bad params")])
+def test_interrupted_half_open_trial_is_released_without_a_failure(clock, error):
+    client = half_open_client(clock, error)
+    failures = client.breaker.failures
+    with pytest.raises(type(error)):
+        client.get("https://example.invalid")
+    assert client.breaker.failures == failures
+    # Still half-open: the next call is the new trial
+    client.session.get = lambda url, params=None, **kwargs: FakeResponse(200)
+    assert client.get("https://example.invalid").status_code == 200
+    assert client.breaker.state == "closed"
+
+def test_interrupts_never_open_a_closed_breaker(clock):
+    client = UpstreamClient("test", timeout=(1, 1), retries=2)
+
+    def get(url, params=None, **kwargs):
+        raise KeyboardInterrupt()
+    client.session.get = get
+    for _ in range(client.breaker.failure_threshold + 1):
+        with pytest.raises(KeyboardInterrupt):
+            client.get("https://example.invalid")
+    assert client.breaker.failures == 0 and client.breaker.state == "closed"
+
+def test_connection_errors_are_retried_then_recorded(clock):
+    client = UpstreamClient("test", timeout=(1, 1), retries=2)
+    client._backoff = lambda attempt: None
+    calls = []
+
+    def get(url, params=None, **kwargs):
+        calls.append(url)
+        raise requests.ConnectionError("refused")
+    client.session.get = get
+    with pytest.raises(requests.ConnectionError):
+        client.get("https://example.invalid")
+    assert len(calls) == 3
+    assert client.breaker.failures == 1
+
+class FailingAsyncClient:
+    def __init__(self, error):
+        self.error = error
+
+    async def get(self, url, params=None, **kwargs):
+        raise self.error
+
+@pytest.mark.parametrize("error", [
+    httpx.DecodingError("bad gzip"),
+    httpx.TooManyRedirects("loop"),
+])
+def test_async_upstream_error_in_half_open_trial_reopens(clock, error):
+    client = AsyncUpstreamClient("test", timeout=(1, 1), retries=2)
+    open_breaker(client.breaker)
+    clock.now += client.breaker.reset_timeout
+    client._get_client = lambda: FailingAsyncClient(error)
+
+    async def call():
+        await client.get("https://example.invalid")
+    with pytest.raises(type(error)):
+        asyncio.run(call())
+    assert client.breaker.state == "open"
+    clock.now += client.breaker.reset_timeout
+    assert client.breaker.allow()
+
+def test_async_cancelled_calls_do_not_count_as_failures(clock):
+    client = AsyncUpstreamClient("test", timeout=(1, 1), retries=2)
+    client._get_client = lambda: FailingAsyncClient(asyncio.CancelledError())
+
+    async def call():
+        await client.get("https://example.invalid")
+    for _ in range(client.breaker.failure_threshold + 1):
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(call())
+    assert client.breaker.failures == 0 and client.breaker.state == "closed"
+
+    # A cancelled half-open trial lets the next call through as the new trial
+    open_breaker(client.breaker)
+    clock.now += client.breaker.reset_timeout
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(call())
+    assert client.breaker.state == "half_open" and client.breaker.allow()
@@ -0,0 +1,220 @@
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# Per-upstream connection and retry settings. Timeouts are (connect, read) seconds.
+UPSTREAMS = {
+    "gomaps": {"timeout": (3.05, 10), "retries": 2, "pool_size": 20},
+    "postalpincode": {"timeout": (3.05, 5), "retries": 2, "pool_size": 10},
+    "open_meteo": {"timeout": (3.05, 5), "retries": 2, "pool_size": 10},
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE_SECONDS = 0.2
+BACKOFF_MAX_SECONDS = 2.0
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. After `failure_threshold` failures
+    calls fail fast for `reset_timeout` seconds, then a single trial call is
+    let through; its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+    def release_trial(self):
+        """End a call that neither succeeded nor failed upstream (e.g. cancelled) without counting it."""
+        with self._lock:
+            self.trial_in_flight = False
+
+class UpstreamClient:
+    """
+    Keep-alive HTTP client for one upstream host, with connect/read timeouts,
+    bounded jittered retries for GETs and a circuit breaker.
+    """
+
+    def __init__(self, name, timeout, retries=2, pool_size=10):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.breaker = CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _backoff(self, attempt):
+        # Full jitter: sleep a random time up to the exponential cap
+        cap = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt))
+        time.sleep(random.uniform(0, cap))
+
+    def get(self, url, params=None, **kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} upstream unavailable (circuit open)")
+
+        kwargs.setdefault("timeout", self.timeout)
+        last_error = None
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    self._backoff(attempt - 1)
+                try:
+                    response = self.session.get(url, params=params, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    last_error = e
+                    continue
+                if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                    response.close()
+                    continue
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                return response
+        except requests.RequestException:
+            # Decoding errors, redirect loops and the like are the upstream's fault
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Interrupts and our own errors must still end a half-open trial,
+            # or the breaker would stay open for good, but are not failures
+            self.breaker.release_trial()
+            raise
+
+        self.breaker.record_failure()
+        raise last_error
+
+    def stats(self):
+        return {"state": self.breaker.state, "consecutive_failures": self.breaker.failures}
+
+class AsyncUpstreamClient:
+    """
+    asyncio counterpart of UpstreamClient built on a pooled httpx.AsyncClient.
+    It shares the circuit breaker of the synchronous client for the same host.
+    """
+
+    def __init__(self, name, timeout, retries=2, pool_size=10, breaker=None):
+        self.name = name
+        connect_timeout, read_timeout = timeout
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.retries = retries
+        self.breaker = breaker or CircuitBreaker()
+        # Async callers multiplex many requests on one loop, so allow a larger pool
+        self.limits = httpx.Limits(max_connections=pool_size * 5, max_keepalive_connections=pool_size)
+        self._client = None
+        self._loop = None
+
+    def _get_client(self):
+        # An AsyncClient is bound to the event loop it first ran on
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+            self._loop = loop
+        return self._client
+
+    async def get(self, url, params=None, **kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} upstream unavailable (circuit open)")
+
+        last_error = None
+        try:
+            client = self._get_client()
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    cap = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** (attempt - 1)))
+                    await asyncio.sleep(random.uniform(0, cap))
+                try:
+                    response = await client.get(url, params=params, **kwargs)
+                except (httpx.TransportError, httpx.TimeoutException) as e:
+                    last_error = e
+                    continue
+                if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                    continue
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                return response
+        except httpx.HTTPError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Includes CancelledError from a client disconnect, see UpstreamClient.get
+            self.breaker.release_trial()
+            raise
+
+        self.breaker.record_failure()
+        raise last_error
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+clients = {
+    name: UpstreamClient(name, **settings)
+    for name, settings in UPSTREAMS.items()
+}
+
+async_clients = {
+    name: AsyncUpstreamClient(name, breaker=clients[name].breaker, **settings)
+    for name, settings in UPSTREAMS.items()
+}
+
+def upstream_get(service, url, params=None, **kwargs):
+    """GET through the shared client for a configured upstream service."""
+    return clients[service].get(url, params=params, **kwargs)
+
+async def upstream_get_async(service, url, params=None, **kwargs):
+    """Async GET through the shared httpx pool for a configured upstream service."""
+    return await async_clients[service].get(url, params=params, **kwargs)
+
+def upstream_stats():
+    return {name: client.stats() for name, client in clients.items()}
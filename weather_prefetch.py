@@ -0,0 +1,167 @@
+"""
+Keeps the weather cache warm for the areas users are searching from.
+
+The hottest weather grid cells are ranked from recent UserInteraction
+coordinates (the same activity the admin dashboard's top-pincodes chart
+counts). Every check the prefetcher refetches, in bulk Open-Meteo requests,
+the hot cells whose cache entry is missing or expires within the lead time, so
+recommendations for active areas find fresh weather and never wait for it.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import desc, func, select
+
+from cache import weather_cache
+from model import (
+    db, UserInteraction, WEATHER_GRID_DEGREES, WEATHER_BATCH_MAX_LOCATIONS,
+    fetch_weather_cells, get_weather_cache_key
+)
+
+WEATHER_PREFETCH_CELLS = 200
+WEATHER_PREFETCH_WINDOW_HOURS = 24
+# How often cache expiry is checked, and how early before expiry a cell is refetched
+WEATHER_PREFETCH_CHECK_SECONDS = 60
+WEATHER_PREFETCH_LEAD_SECONDS = 3 * 60
+# The hot-cell ranking is recomputed this often
+WEATHER_PREFETCH_RANK_SECONDS = 10 * 60
+
+# Every prefetcher by name, for the admin stats endpoint
+prefetchers = {}
+
+def load_hot_cells(limit=WEATHER_PREFETCH_CELLS, window_hours=WEATHER_PREFETCH_WINDOW_HOURS):
+    """[(cell, searches)] for the most searched-from grid cells, busiest first. Needs an app context."""
+    lat_cell = func.round(UserInteraction.latitude / WEATHER_GRID_DEGREES)
+    lon_cell = func.round(UserInteraction.longitude / WEATHER_GRID_DEGREES)
+    # Interaction timestamps are written in local time (app.record_search_interaction)
+    since = datetime.now() - timedelta(hours=window_hours)
+    rows = db.session.execute(
+        select(lat_cell, lon_cell, func.count().label('search_count'))
+        .where(
+            UserInteraction.timestamp >= since,
+            UserInteraction.latitude.isnot(None),
+            UserInteraction.longitude.isnot(None)
+        )
+        .group_by(lat_cell, lon_cell)
+        .order_by(desc('search_count'))
+        .limit(limit)
+    ).all()
+    return [
+        ((round(lat * WEATHER_GRID_DEGREES, 4), round(lon * WEATHER_GRID_DEGREES, 4)), count)
+        for lat, lon, count in rows
+    ]
+
+class WeatherPrefetcher:
+    """
+    Background thread refreshing the weather cache for the cells returned by
+    rank_fn() before their entries expire. Failures are logged and retried at
+    the next check.
+    """
+
+    def __init__(self, name, rank_fn, check_seconds=WEATHER_PREFETCH_CHECK_SECONDS,
+                 lead_seconds=WEATHER_PREFETCH_LEAD_SECONDS, rank_seconds=WEATHER_PREFETCH_RANK_SECONDS,
+                 batch_size=WEATHER_BATCH_MAX_LOCATIONS):
+        self.name = name
+        self.rank_fn = rank_fn
+        self.check_seconds = check_seconds
+        self.lead_seconds = lead_seconds
+        self.rank_seconds = rank_seconds
+        self.batch_size = batch_size
+        self.hot_cells = []
+        self.fetched_at = {}
+        self._ranked_at = None
+        self._lock = threading.Lock()
+        self._worker = None
+        self.checks = 0
+        self.requests = 0
+        self.cells_fetched = 0
+        self.errors = 0
+        self.last_check_ms = None
+        prefetchers[name] = self
+
+    def start(self):
+        # Started per process so forked web workers each get their own thread
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f"prefetch-{self.name}", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                print("Error prefetching weather:", str(e))
+                with self._lock:
+                    self.errors += 1
+            time.sleep(self.check_seconds)
+
+    def _due(self, cell):
+        expires_in = weather_cache.expires_in(get_weather_cache_key(cell))
+        return expires_in is None or expires_in < self.lead_seconds
+
+    def check(self):
+        """Re-rank if due, then refetch every hot cell that is missing or about to expire."""
+        started = time.perf_counter()
+        if self._ranked_at is None or time.monotonic() - self._ranked_at >= self.rank_seconds:
+            hot_cells = [cell for cell, _ in self.rank_fn()]
+            with self._lock:
+                self.hot_cells = hot_cells
+                self.fetched_at = {cell: self.fetched_at[cell] for cell in hot_cells if cell in self.fetched_at}
+                self._ranked_at = time.monotonic()
+
+        # Entries written by other workers through a shared cache backend count too
+        due = [cell for cell in self.hot_cells if self._due(cell)]
+        for start in range(0, len(due), self.batch_size):
+            self._fetch(due[start:start + self.batch_size])
+        with self._lock:
+            self.checks += 1
+            self.last_check_ms = round((time.perf_counter() - started) * 1000, 1)
+        if due:
+            print(f"Prefetched weather for {len(due)} of {len(self.hot_cells)} hot cells")
+
+    def _fetch(self, cells):
+        try:
+            weather, = fetch_weather_cells([np.array([lat for lat, _ in cells]), np.array([lon for _, lon in cells])])
+        except Exception as e:
+            print(f"Error prefetching weather for {len(cells)} cells:", str(e))
+            with self._lock:
+                self.errors += 1
+            return
+        now = time.time()
+        for cell, value in zip(cells, weather):
+            weather_cache.set(get_weather_cache_key(cell), value)
+        with self._lock:
+            self.requests += 1
+            self.cells_fetched += len(cells)
+            self.fetched_at.update((cell, now) for cell in cells)
+
+    def stats(self):
+        """Coverage: share of hot cells with a fresh cache entry. Staleness: age of the entries this worker fetched."""
+        with self._lock:
+            hot_cells = list(self.hot_cells)
+            fetched_at = dict(self.fetched_at)
+        expiries = [weather_cache.expires_in(get_weather_cache_key(cell)) for cell in hot_cells]
+        fresh = sum(1 for expires_in in expiries if expires_in is not None and expires_in > 0)
+        now = time.time()
+        ages = [now - fetched_at[cell] for cell in hot_cells if cell in fetched_at]
+        with self._lock:
+            return {
+                "hot_cells": len(hot_cells),
+                "fresh_cells": fresh,
+                "coverage": round(fresh / len(hot_cells), 3) if hot_cells else None,
+                "stale_cells": sum(1 for expires_in in expiries if expires_in is not None and expires_in <= 0),
+                "missing_cells": sum(1 for expires_in in expiries if expires_in is None),
+                "max_age_seconds": round(max(ages)) if ages else None,
+                "mean_age_seconds": round(sum(ages) / len(ages)) if ages else None,
+                "checks": self.checks,
+                "requests": self.requests,
+                "cells_fetched": self.cells_fetched,
+                "errors": self.errors,
+                "last_check_ms": self.last_check_ms
+            }
+
+def prefetch_stats():
+    return {name: prefetcher.stats() for name, prefetcher in prefetchers.items()}
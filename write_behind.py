@@ -0,0 +1,170 @@
+import atexit
+import queue
+import threading
+import time
+
+# Every write-behind log by name, for the admin stats endpoint
+logs = {}
+
+class WriteBehindLog:
+    """
+    Buffers rows in memory and writes them in bulk from a background thread.
+
+    append() only enqueues, so requests never wait for the database. The
+    flusher writes up to batch_size rows per flush_fn call, as soon as a batch
+    is full or flush_interval_ms after its first row arrived. The queue holds
+    at most max_pending rows: when it is full append() waits up to
+    max_block_ms for room and then drops the row. Rows whose flush_fn call
+    fails are retried once and then counted as failed. Pending rows are
+    flushed at interpreter exit.
+
+    flush_fn(rows) must be safe to call from any thread: once the log is
+    closed, append() writes from the caller's thread.
+    """
+
+    def __init__(self, name, flush_fn, batch_size=500, flush_interval_ms=1000, max_pending=20000, max_block_ms=50):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_block = max_block_ms / 1000
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._closed = False
+        self.appended = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+        self.blocked = 0
+        self.max_pending = 0
+        self.total_flush_ms = 0.0
+        logs[name] = self
+        atexit.register(self.close)
+
+    def _ensure_worker(self):
+        # Started on first use so forked web workers each get their own thread
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f"write-behind-{self.name}", daemon=True)
+                self._worker.start()
+
+    def append(self, row):
+        """Queue one row. Returns False if it was dropped because the buffer stayed full."""
+        if self._closed:
+            self._write([row])
+            return True
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self.blocked += 1
+            try:
+                self._queue.put(row, timeout=self.max_block)
+            except queue.Full:
+                with self._lock:
+                    self.dropped += 1
+                print(f"Write-behind buffer full ({self.name}), dropping row")
+                return False
+        depth = self._queue.qsize()
+        with self._lock:
+            self.appended += 1
+            self.max_pending = max(self.max_pending, depth)
+        return True
+
+    def _collect(self, first):
+        """A batch starting with `first`, plus the flush request that ended it early, if any."""
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                return batch, item
+            batch.append(item)
+        return batch, None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            batch, flushed = self._collect(item)
+            self._write(batch)
+            if flushed:
+                flushed.set()
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        for attempt in (1, 2):
+            try:
+                self.flush_fn(batch)
+                break
+            except Exception as e:
+                print(f"Error writing {len(batch)} rows ({self.name}, attempt {attempt}):", str(e))
+        else:
+            with self._lock:
+                self.failed += len(batch)
+            return
+        with self._lock:
+            self.batches += 1
+            self.written += len(batch)
+            self.total_flush_ms += (time.perf_counter() - started) * 1000
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+            else:
+                batch.append(item)
+        for start in range(0, len(batch), self.batch_size):
+            self._write(batch[start:start + self.batch_size])
+
+    def flush(self, timeout=10):
+        """Wait until every row queued before this call has been written. Returns False on timeout."""
+        with self._lock:
+            worker = self._worker
+        if worker is None or not worker.is_alive():
+            self._drain()
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self):
+        """Flush; rows appended afterwards are written synchronously. Registered to run at exit."""
+        self._closed = True
+        if not self.flush():
+            print(f"Write-behind flush timed out ({self.name}), {self._queue.qsize()} rows not written")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": self._queue.qsize(),
+                "max_pending": self.max_pending,
+                "appended": self.appended,
+                "written": self.written,
+                "batches": self.batches,
+                "mean_batch_size": round(self.written / self.batches, 2) if self.batches else 0,
+                "mean_flush_ms": round(self.total_flush_ms / self.batches, 2) if self.batches else 0,
+                "blocked": self.blocked,
+                "dropped": self.dropped,
+                "failed": self.failed
+            }
+
+def write_behind_stats():
+    return {name: log.stats() for name, log in logs.items()}